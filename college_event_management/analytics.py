@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, delete, func, insert, literal, select, union_all
+
+from models import db, Event, Registration, ArchivedRegistration, EventStats, DailyStats, AnalyticsDelta
+
+DEFAULT_COMPACT_INTERVAL = 30
+DEFAULT_COMPACT_BATCH = 10000
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+EVENT_ROWS = 20
+
+
+class Analytics:
+    # Registration writers append a row to analytics_delta inside their own
+    # transaction: an insert, so they never queue behind a shared counter row.
+    # compact() folds the deltas into event_stats and daily_stats, which are
+    # the only tables the analytics page and API read. A background thread
+    # compacts every ANALYTICS_COMPACT_INTERVAL seconds (0 disables it); it
+    # starts on the first recorded change so CLI commands never spawn it.
+
+    def __init__(self, app=None, interval=DEFAULT_COMPACT_INTERVAL, batch_size=DEFAULT_COMPACT_BATCH):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('ANALYTICS_COMPACT_INTERVAL', self.interval)
+        self.batch_size = app.config.get('ANALYTICS_COMPACT_BATCH', self.batch_size)
+        app.extensions['analytics'] = self
+
+    def record(self, event_id, registrations=0, cancellations=0, revenue=0.0):
+        # Call inside the transaction that changes the registrations
+        db.session.execute(insert(AnalyticsDelta).values(
+            event_id=event_id, day=datetime.utcnow().date(), registrations=registrations,
+            cancellations=cancellations, revenue=revenue
+        ))
+        self._start_compactor()
+
+    def _start_compactor(self):
+        if not self.interval:
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name='analytics-compactor', daemon=True)
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            time.sleep(self.interval)
+            with self.app.app_context():
+                try:
+                    self.compact()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Analytics compaction failed')
+                finally:
+                    db.session.remove()
+
+    def compact(self):
+        # Folds pending deltas in batches and returns how many were folded.
+        # Each batch claims its deltas with DELETE ... RETURNING, so compactors
+        # in several worker processes never fold a delta twice, and a failed
+        # batch rolls its deltas back for the next run.
+        deltas = AnalyticsDelta.__table__
+        folded = 0
+        while True:
+            batch = select(deltas.c.id).order_by(deltas.c.id).limit(self.batch_size).scalar_subquery()
+            rows = db.session.execute(
+                delete(deltas).where(deltas.c.id.in_(batch)).returning(
+                    deltas.c.event_id, deltas.c.day, deltas.c.registrations, deltas.c.cancellations, deltas.c.revenue
+                )
+            ).all()
+            if not rows:
+                db.session.rollback()
+                break
+            events = defaultdict(lambda: {'registered': 0, 'cancellations': 0, 'revenue': 0.0})
+            days = defaultdict(lambda: {'registrations': 0, 'cancellations': 0, 'revenue': 0.0})
+            for event_id, day, registrations, cancellations, revenue in rows:
+                events[event_id]['registered'] += registrations - cancellations
+                events[event_id]['cancellations'] += cancellations
+                events[event_id]['revenue'] += revenue
+                days[day]['registrations'] += registrations
+                days[day]['cancellations'] += cancellations
+                days[day]['revenue'] += revenue
+            now = datetime.utcnow()
+            _fold(EventStats.__table__.c.event_id, events, now)
+            _fold(DailyStats.__table__.c.day, days, now)
+            db.session.commit()
+            folded += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        return folded
+
+    def rebuild(self):
+        # Recomputes the rollups from the registration table, e.g. after raw
+        # SQL imports. Cancellation history is not kept anywhere else, so the
+        # cancellation counts restart at zero. Archived registrations still
+        # count towards their days. Run it while nothing registers.
+        registrations = union_all(
+            select(Registration.registration_date, Registration.payment_amount),
+            select(ArchivedRegistration.registration_date, ArchivedRegistration.payment_amount),
+        ).subquery()
+        day = func.date(registrations.c.registration_date)
+        db.session.execute(delete(AnalyticsDelta))
+        db.session.execute(delete(EventStats))
+        db.session.execute(delete(DailyStats))
+        now = datetime.utcnow()
+        db.session.execute(insert(EventStats).from_select(
+            ['event_id', 'registered', 'cancellations', 'revenue', 'updated_at'],
+            select(Registration.event_id, func.count(Registration.id), literal(0),
+                   func.coalesce(func.sum(Registration.payment_amount), 0.0), literal(now))
+            .group_by(Registration.event_id)
+        ))
+        db.session.execute(insert(DailyStats).from_select(
+            ['day', 'registrations', 'cancellations', 'revenue', 'updated_at'],
+            select(day, func.count(), literal(0),
+                   func.coalesce(func.sum(registrations.c.payment_amount), 0.0), literal(now))
+            .where(registrations.c.registration_date.isnot(None))
+            .group_by(day)
+        ))
+        db.session.commit()
+
+
+analytics = Analytics()
+
+
+def _fold(key, totals, now):
+    # Adds to the existing rollup rows with one executemany UPDATE and inserts
+    # the missing ones with one executemany INSERT
+    table = key.table
+    names = list(next(iter(totals.values())))
+    existing = set(db.session.execute(select(key).where(key.in_(list(totals)))).scalars())
+    if existing:
+        values = {name: table.c[name] + bindparam(f'b_{name}') for name in names}
+        db.session.execute(
+            table.update().where(key == bindparam('b_key')).values(**values, updated_at=now),
+            [{'b_key': value, **{f'b_{name}': totals[value][name] for name in names}} for value in existing]
+        )
+    missing = [value for value in totals if value not in existing]
+    if missing:
+        db.session.execute(table.insert(), [
+            {key.name: value, **totals[value], 'updated_at': now} for value in missing
+        ])
+
+
+def fill_rate(registered, max_seats):
+    return round(registered / max_seats, 4) if max_seats else None
+
+
+def analytics_summary(days=DEFAULT_DAYS, now=None):
+    # Reads only the rollups: one range scan over at most MAX_DAYS day rows
+    # and two index-ordered queries of EVENT_ROWS events, whatever the size
+    # of the registration history
+    days = max(1, min(days, MAX_DAYS))
+    # Days are UTC like the registration dates; event dates are local time
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    now = now or datetime.now()
+    stored = {
+        row.day: row for row in db.session.execute(
+            select(DailyStats.day, DailyStats.registrations, DailyStats.cancellations, DailyStats.revenue)
+            .where(DailyStats.day >= since)
+        )
+    }
+    series = []
+    for offset in range(days):
+        day = since + timedelta(days=offset)
+        row = stored.get(day)
+        series.append({
+            'day': day.isoformat(),
+            'registrations': row.registrations if row else 0,
+            'cancellations': row.cancellations if row else 0,
+            'revenue': round(row.revenue, 2) if row else 0.0,
+        })
+    totals = {
+        name: sum(entry[name] for entry in series) for name in ('registrations', 'cancellations', 'revenue')
+    }
+    totals['revenue'] = round(totals['revenue'], 2)
+
+    # Plain columns rather than entities: ORM objects would cost more than the queries
+    columns = (Event.id, Event.name, Event.date, Event.max_seats,
+               EventStats.registered, EventStats.cancellations, EventStats.revenue)
+    # ix_event_date_id and ix_event_stats_registered keep both lists index walks
+    upcoming = db.session.execute(
+        select(*columns).outerjoin(EventStats, EventStats.event_id == Event.id)
+        .where(Event.date >= now).order_by(Event.date, Event.id).limit(EVENT_ROWS)
+    ).all()
+    top = db.session.execute(
+        select(*columns).select_from(EventStats).join(Event, Event.id == EventStats.event_id)
+        .order_by(EventStats.registered.desc()).limit(EVENT_ROWS)
+    ).all()
+    return {
+        'days': days,
+        'totals': totals,
+        'series': series,
+        'upcoming': [serialize_event_stats(row) for row in upcoming],
+        'top': [serialize_event_stats(row) for row in top],
+    }
+
+
+def serialize_event_stats(row):
+    registered = row.registered or 0
+    return {
+        'event_id': row.id,
+        'name': row.name,
+        'date': row.date.isoformat(),
+        'max_seats': row.max_seats,
+        'registered': registered,
+        'cancellations': row.cancellations or 0,
+        'revenue': round(row.revenue or 0.0, 2),
+        'fill_rate': fill_rate(registered, row.max_seats),
+    }
@@ -1,43 +1,114 @@
-from flask import Flask, render_template, redirect, url_for, request, flash, jsonify
-from flask_sqlalchemy import SQLAlchemy
+import io
+import os
+from flask import Flask, Blueprint, Response, current_app, stream_with_context, render_template, redirect, url_for, request, flash, jsonify, abort
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from models import db, User, Event, Registration, Notification, ChatMessage
+from database import init_database
 from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
+from reservations import reserve_seat, EventFull, AlreadyRegistered, ReservationError
+from waitlist import (join_waitlist, leave_waitlist, waitlist_place, cancel_registration, promote,
+                      notify_promoted, AlreadyWaitlisted, NotRegistered)
+from chat_stream import broker, open_stream, serialize_message, STREAM_RETRY_MS
+from chat_history import chat_history, conversation_index, latest_message, mark_conversation_read, DEFAULT_HISTORY_SIZE
+from notifications import pipeline, PipelineFull
+from counters import unread, mark_all_notifications_read
+from queries import serialize_event, InvalidCursor, DEFAULT_PAGE_SIZE
+from event_cache import event_cache, event_snapshot
+from fragments import fragment_cache
+from responses import compressor, conditional
+from metrics import metrics, PROMETHEUS_CONTENT_TYPE
+from auth import passwords, login_limiter, VerifierBusy
+from identity import identity
+from replica import read_replica
+from analytics import analytics, analytics_summary, DEFAULT_DAYS
+from archive import delete_event as delete_event_rows
+from search import search_events, parse_date, exclude_search_tables, InvalidSearch, DEFAULT_SEARCH_SIZE
+from bulk import data_cli, import_events, export_registrations, BulkImportError
+from bench import bench_cli
+from serve import serve_command
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+main = Blueprint('main', __name__)
+migrate = Migrate(include_name=exclude_search_tables)
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
 
-db.init_app(app)
-migrate = Migrate(app, db)
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
+
+def create_app(config_object=None, **overrides):
+    # APP_CONFIG picks the config class, e.g. APP_CONFIG=config.ProductionConfig
+    app = Flask(__name__)
+    app.config.from_object(config_object or os.environ.get('APP_CONFIG', 'config.DevelopmentConfig'))
+    # FLASK_-prefixed environment variables override the config object, e.g. FLASK_METRICS_ENABLED=true
+    app.config.from_prefixed_env()
+    app.config.update(overrides)
+    if not app.config.get('SECRET_KEY'):
+        raise RuntimeError('SECRET_KEY is not set: export SECRET_KEY before starting the app')
+    if app.config.get('PROXY_COUNT'):
+        # Trust X-Forwarded-For/-Proto from that many reverse proxies, so
+        # request.remote_addr (and the login limiter) sees the real client
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_COUNT'], x_proto=app.config['PROXY_COUNT'])
+
+    init_database(app)
+    migrate.init_app(app, db)
+    pipeline.init_app(app)
+    event_cache.init_app(app)
+    fragment_cache.init_app(app)
+    compressor.init_app(app)
+    metrics.init_app(app)
+    broker.init_app(app)
+    passwords.init_app(app)
+    login_limiter.init_app(app)
+    analytics.init_app(app)
+    login_manager.init_app(app)
+
+    app.register_blueprint(main)
+    app.cli.add_command(bench_cli)
+    app.cli.add_command(data_cli)
+    app.cli.add_command(serve_command)
+    return app
+
+@pipeline.on_batch
+def count_fanout(user_ids):
+    for user_id in user_ids:
+        unread.incr(user_id, 'notifications')
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return identity.load(int(user_id))
 
-@app.route('/')
+@main.route('/')
 def home():
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
-        username = request.form.get('username')
-        password = request.form.get('password')
+        username = request.form.get('username') or ''
+        password = request.form.get('password') or ''
+        retry_after = login_limiter.check(username, request.remote_addr)
+        if retry_after:
+            flash('Too many login attempts. Please try again in a minute.', 'danger')
+            return render_template('login.html'), 429, {'Retry-After': str(int(retry_after) + 1)}
         user = User.query.filter_by(username=username).first()
-        
-        if user and check_password_hash(user.password, password):
+
+        try:
+            verified = passwords.verify(user.password if user else None, password)
+        except VerifierBusy:
+            flash('The server is busy. Please try again shortly.', 'danger')
+            return render_template('login.html'), 503, {'Retry-After': '5'}
+        if verified:
+            if passwords.needs_rehash(user.password):
+                # Upgrade hashes made with older parameters while we have the password
+                user.password = passwords.hash(password)
+                db.session.commit()
+            login_limiter.succeeded(username, request.remote_addr)
             login_user(user)
-            return redirect(url_for('admin_dashboard' if user.role == 'admin' else 'student_dashboard'))
+            return redirect(url_for('main.admin_dashboard' if user.role == 'admin' else 'main.student_dashboard'))
         flash('Invalid username or password', 'danger')
     return render_template('login.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -45,55 +116,132 @@ def register():
         
         if User.query.filter_by(username=username).first():
             flash('Username already exists', 'danger')
-        else:
-            new_user = User(
-                username=username,
-                password=generate_password_hash(password),
-                role='student'
-            )
-            db.session.add(new_user)
-            db.session.commit()
-            flash('Registration successful! Please login', 'success')
-            return redirect(url_for('login'))
+            return render_template('register.html')
+        try:
+            password_hash = passwords.hash(password)
+        except VerifierBusy:
+            flash('The server is busy. Please try again shortly.', 'danger')
+            return render_template('register.html'), 503, {'Retry-After': '5'}
+        new_user = User(
+            username=username,
+            password=password_hash,
+            role='student'
+        )
+        db.session.add(new_user)
+        db.session.commit()
+        flash('Registration successful! Please login', 'success')
+        return redirect(url_for('main.login'))
     return render_template('register.html')
 
-@app.route('/logout')
+@main.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route('/admin/dashboard')
+@main.route('/admin/dashboard')
 @login_required
+@read_replica
+@conditional
 def admin_dashboard():
     if current_user.role != 'admin':
-        return redirect(url_for('student_dashboard'))
-    events = Event.query.all()
-    return render_template('admin_dashboard.html', events=events)
+        return redirect(url_for('main.student_dashboard'))
+    try:
+        upcoming, next_upcoming = event_cache.event_page('upcoming', request.args.get('after'))
+        past, next_past = event_cache.event_page('past', request.args.get('before'))
+    except InvalidCursor:
+        abort(400)
+    return render_template('admin_dashboard.html', upcoming=upcoming, next_upcoming=next_upcoming,
+                           past=past, next_past=next_past)
 
-@app.route('/student/dashboard')
+@main.route('/student/dashboard')
 @login_required
+@read_replica
+@conditional
 def student_dashboard():
     if current_user.role != 'student':
-        return redirect(url_for('admin_dashboard'))
-    events = Event.query.all()
-    return render_template('student_dashboard.html', events=events)
+        return redirect(url_for('main.admin_dashboard'))
+    try:
+        events, next_cursor = event_cache.event_page('upcoming', request.args.get('after'))
+    except InvalidCursor:
+        abort(400)
+    return render_template('student_dashboard.html', events=events, next_cursor=next_cursor)
 
-@app.route('/event/<int:event_id>')
+@main.route('/api/events')
 @login_required
+def api_events():
+    scope = request.args.get('scope', 'upcoming')
+    if scope not in ('upcoming', 'past'):
+        return jsonify({'success': False, 'message': 'scope must be upcoming or past'}), 400
+    try:
+        rows, next_cursor = event_cache.event_page(scope, request.args.get('after'),
+                                                   request.args.get('limit', DEFAULT_PAGE_SIZE, type=int))
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({
+        'events': [serialize_event(event, registered) for event, registered in rows],
+        'next': next_cursor
+    })
+
+@main.route('/events/search')
+@login_required
+@read_replica
+def search():
+    q = request.args.get('q', '').strip()
+    results, truncated = [], False
+    if q:
+        try:
+            results, truncated = search_events(
+                q,
+                parse_date(request.args.get('from'), 'from'),
+                parse_date(request.args.get('to'), 'to', end=True)
+            )
+        except InvalidSearch as e:
+            flash(str(e), 'danger')
+    return render_template('search.html', q=q, results=results, truncated=truncated)
+
+@main.route('/api/events/search')
+@login_required
+@read_replica
+def api_search_events():
+    try:
+        rows, truncated = search_events(
+            request.args.get('q', ''),
+            parse_date(request.args.get('from'), 'from'),
+            parse_date(request.args.get('to'), 'to', end=True),
+            request.args.get('limit', DEFAULT_SEARCH_SIZE, type=int)
+        )
+    except InvalidSearch as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({
+        'events': [
+            {**serialize_event(event_snapshot(event), registered), 'rank': rank}
+            for event, registered, rank in rows
+        ],
+        # Only the newest SEARCH_MAX_RANKED_MATCHES matches were ranked; a
+        # date range searches all of them
+        'truncated': truncated
+    })
+
+@main.route('/event/<int:event_id>')
+@login_required
+@read_replica
 def view_event(event_id):
-    event = Event.query.get_or_404(event_id)
+    event = event_cache.get_event(event_id)
+    if event is None:
+        abort(404)
     registered = Registration.query.filter_by(
         user_id=current_user.id,
-        event_id=event.id
+        event_id=event_id
     ).first()
-    return render_template('event.html', event=event, registered=registered)
+    place = waitlist_place(current_user.id, event_id) if registered is None else 0
+    return render_template('event.html', event=event, registered=registered, waitlist_place=place)
 
-@app.route('/create_event', methods=['GET', 'POST'])
+@main.route('/create_event', methods=['GET', 'POST'])
 @login_required
 def create_event():
     if current_user.role != 'admin':
-        return redirect(url_for('student_dashboard'))
+        return redirect(url_for('main.student_dashboard'))
     
     if request.method == 'POST':
         try:
@@ -107,123 +255,324 @@ def create_event():
             )
             db.session.add(event)
             db.session.commit()
+            event_cache.invalidate_listings()
             flash('Event created successfully!', 'success')
-            return redirect(url_for('admin_dashboard'))
+            return redirect(url_for('main.admin_dashboard'))
         except Exception as e:
             db.session.rollback()
             flash(f'Error creating event: {str(e)}', 'danger')
     return render_template('create_event.html')
 
-@app.route('/edit_event/<int:event_id>', methods=['GET', 'POST'])
+@main.route('/edit_event/<int:event_id>', methods=['GET', 'POST'])
 @login_required
 def edit_event(event_id):
     if current_user.role != 'admin':
-        return redirect(url_for('student_dashboard'))
+        return redirect(url_for('main.student_dashboard'))
     
     event = Event.query.get_or_404(event_id)
     if request.method == 'POST':
         try:
+            previous_date = event.date
+            previous_seats = event.max_seats
             event.name = request.form['name']
             event.description = request.form['description']
             event.date = datetime.strptime(request.form['date'], '%Y-%m-%dT%H:%M')
             event.location = request.form['location']
             event.max_seats = int(request.form.get('max_seats', 100))
             event.registration_fee = float(request.form.get('registration_fee', 0.0))
+            # New seats go to the waitlist first, in the same transaction
+            promoted = promote(event.id) if event.max_seats > previous_seats else []
             db.session.commit()
+            notify_promoted(promoted)
+            event_cache.invalidate_event(event.id)
+            if promoted:
+                flash(f'{len(promoted)} students were moved off the waitlist', 'info')
             flash('Event updated successfully!', 'success')
-            return redirect(url_for('admin_dashboard'))
+            if event.date != previous_date:
+                message = f"{event.name} has been rescheduled to {event.date.strftime('%Y-%m-%d %H:%M')}"
+            else:
+                message = f"{event.name} has been updated"
+            try:
+                pipeline.enqueue_event_fanout(event.id, message)
+            except PipelineFull:
+                flash('Registrants could not be notified right now', 'danger')
+            return redirect(url_for('main.admin_dashboard'))
         except Exception as e:
             db.session.rollback()
             flash(f'Error updating event: {str(e)}', 'danger')
     return render_template('edit_event.html', event=event)
 
-@app.route('/delete_event/<int:event_id>', methods=['POST'])
+@main.route('/admin/events/<int:event_id>/notify', methods=['POST'])
+@login_required
+def notify_registrants(event_id):
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Admins only'}), 403
+
+    event = Event.query.get_or_404(event_id)
+    message = (request.get_json(silent=True) or request.form).get('message')
+    if not message:
+        return jsonify({'success': False, 'message': 'Message cannot be empty'}), 400
+    try:
+        job = pipeline.enqueue_event_fanout(event.id, message)
+    except PipelineFull as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+    return jsonify({
+        'success': True,
+        'job': pipeline.job(job.id),
+        'status_url': url_for('main.notify_job_status', job_id=job.id)
+    }), 202
+
+@main.route('/admin/notify_jobs/<int:job_id>')
+@login_required
+def notify_job_status(job_id):
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Admins only'}), 403
+
+    job = pipeline.job(job_id)
+    if job is None:
+        abort(404)
+    return jsonify({'success': True, 'job': job})
+
+@main.route('/admin/events/import', methods=['POST'])
+@login_required
+def import_events_upload():
+    if current_user.role != 'admin':
+        return redirect(url_for('main.student_dashboard'))
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Choose a CSV or JSON file to import', 'danger')
+        return redirect(url_for('main.admin_dashboard'))
+    fmt = 'csv' if upload.filename.lower().endswith('.csv') else 'json'
+    try:
+        imported = import_events(io.TextIOWrapper(upload.stream, encoding='utf-8', newline=''), fmt)
+        flash(f'Imported {imported} events', 'success')
+    except (BulkImportError, UnicodeDecodeError) as e:
+        flash(f'Error importing events: {str(e)}', 'danger')
+    return redirect(url_for('main.admin_dashboard'))
+
+@main.route('/admin/registrations/export')
+@login_required
+def export_registrations_download():
+    if current_user.role != 'admin':
+        return redirect(url_for('main.student_dashboard'))
+
+    event_id = request.args.get('event_id', type=int)
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'jsonl'):
+        abort(400)
+    filename = f"registrations{f'-event-{event_id}' if event_id else ''}.{fmt}"
+    # Streamed chunk by chunk; the full result set is never held in memory
+    return Response(
+        stream_with_context(export_registrations(event_id, fmt)),
+        mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@main.route('/delete_event/<int:event_id>', methods=['POST'])
 @login_required
 def delete_event(event_id):
     if current_user.role != 'admin':
-        return redirect(url_for('student_dashboard'))
+        return redirect(url_for('main.student_dashboard'))
     
-    event = Event.query.get_or_404(event_id)
+    Event.query.get_or_404(event_id)
     try:
-        # Delete all related registrations first
-        Registration.query.filter_by(event_id=event.id).delete()
-        # Then delete the event
-        db.session.delete(event)
-        db.session.commit()
+        # Batched, so a large event never holds the write lock for long
+        delete_event_rows(event_id)
         flash('Event deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error deleting event: {str(e)}', 'danger')
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('main.admin_dashboard'))
 
-@app.route('/register_event/<int:event_id>', methods=['GET', 'POST'])
+@main.route('/register_event/<int:event_id>', methods=['GET', 'POST'])
 @login_required
 def register_event(event_id):
     if current_user.role != 'student':
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     
     event = Event.query.get_or_404(event_id)
     if Registration.query.filter_by(user_id=current_user.id, event_id=event.id).first():
         flash('You are already registered for this event', 'info')
-        return redirect(url_for('student_dashboard'))
+        return redirect(url_for('main.student_dashboard'))
     
     if request.method == 'POST':
         try:
-            # Check seat availability
-            registered_count = Registration.query.filter_by(event_id=event.id).count()
-            if registered_count >= event.max_seats:
-                flash('No seats available for this event', 'danger')
-                return redirect(url_for('student_dashboard'))
-            
-            # Automatically confirm registration (no admin approval needed)
-            registration = Registration(
-                user_id=current_user.id,
-                event_id=event.id,
-                payment_amount=event.registration_fee,
-                payment_status=True,
-                is_confirmed=True  # Auto-confirm registration
-            )
-            db.session.add(registration)
-            
-            # Create notification for student
-            notification = Notification(
-                user_id=current_user.id,
-                event_id=event.id,
-                message=f"Your registration for {event.name} is confirmed!"
-            )
-            db.session.add(notification)
-            
-            db.session.commit()
+            reserve_seat(current_user.id, event)
             flash('Registration successful!', 'success')
-            return redirect(url_for('student_dashboard'))
+        except EventFull:
+            try:
+                place = join_waitlist(current_user.id, event_id)
+            except AlreadyWaitlisted:
+                flash('The event is full and you are already on its waitlist', 'info')
+            except AlreadyRegistered:
+                # A double submit: the other request took the last seat
+                flash('You are already registered for this event', 'info')
+            except ReservationError as e:
+                flash(str(e), 'danger')
+            else:
+                if place is None:
+                    flash('Registration successful!', 'success')
+                else:
+                    flash(f'The event is full: you are number {place} on the waitlist', 'info')
+        except AlreadyRegistered:
+            flash('You are already registered for this event', 'info')
         except Exception as e:
             db.session.rollback()
             flash(f'Error registering for event: {str(e)}', 'danger')
+            return render_template('register_event.html', event=event)
+        return redirect(url_for('main.student_dashboard'))
     return render_template('register_event.html', event=event)
 
-@app.route('/chat')
+@main.route('/register_event/<int:event_id>/cancel', methods=['POST'])
 @login_required
+def cancel_event_registration(event_id):
+    if current_user.role != 'student':
+        return redirect(url_for('main.admin_dashboard'))
+    try:
+        cancel_registration(current_user.id, event_id)
+        event_cache.invalidate_event(event_id)
+        flash('Your registration has been cancelled', 'success')
+    except NotRegistered as e:
+        flash(str(e), 'info')
+    return redirect(url_for('main.view_event', event_id=event_id))
+
+@main.route('/waitlist/<int:event_id>/leave', methods=['POST'])
+@login_required
+def leave_event_waitlist(event_id):
+    if current_user.role != 'student':
+        return redirect(url_for('main.admin_dashboard'))
+    if leave_waitlist(current_user.id, event_id):
+        flash('You have left the waitlist', 'success')
+    else:
+        flash('You are not on the waitlist for this event', 'info')
+    return redirect(url_for('main.view_event', event_id=event_id))
+
+@main.route('/chat')
+@login_required
+@read_replica
 def chat():
-    messages = ChatMessage.query.filter(
-        (ChatMessage.sender_id == current_user.id) | 
-        (ChatMessage.receiver_id == current_user.id)
-    ).order_by(ChatMessage.timestamp.asc()).all()
-    return render_template('chat.html', messages=messages)
+    if current_user.role == 'admin':
+        return redirect(url_for('main.admin_chat'))
+    mark_conversation_read(current_user.id)
+    messages, next_before_id = chat_history(current_user.id)
+    return render_template('chat.html', messages=messages, next_before_id=next_before_id)
 
-@app.route('/admin/chat')
+@main.route('/admin/chat')
 @login_required
 def admin_chat():
     if current_user.role != 'admin':
-        return redirect(url_for('chat'))
-    
-    messages = ChatMessage.query.filter(
-        (ChatMessage.sender_id == current_user.id) | 
-        (ChatMessage.receiver_id == current_user.id)
-    ).order_by(ChatMessage.timestamp.asc()).all()
-    
-    return render_template('admin_chat.html', messages=messages)
+        return redirect(url_for('main.chat'))
+
+    # Mark read before loading anything: the commit would expire the loaded rows
+    latest = latest_message(current_user.id)
+    student_id = request.args.get('student_id', type=int) or (latest[1] if latest else None)
+    if student_id is not None:
+        mark_conversation_read(current_user.id, student_id)
+    conversations = conversation_index(current_user.id)
+    messages, next_before_id = chat_history(current_user.id, student_id) if student_id else ([], None)
+    # The stream carries every conversation, so it resumes after the newest
+    # message overall, not the newest one in the open conversation
+    stream_last_id = max([latest[0] if latest else 0] + [message.id for message in messages[-1:]])
+    return render_template('admin_chat.html', messages=messages, next_before_id=next_before_id,
+                           conversations=conversations, student_id=student_id, stream_last_id=stream_last_id)
+
+@main.route('/api/chat/messages')
+@login_required
+def api_chat_messages():
+    # Older pages of a conversation; admins pick the student with student_id
+    peer_id = request.args.get('student_id', type=int) if current_user.role == 'admin' else None
+    messages, next_before_id = chat_history(
+        current_user.id,
+        peer_id,
+        request.args.get('before_id', type=int),
+        request.args.get('limit', DEFAULT_HISTORY_SIZE, type=int)
+    )
+    return jsonify({
+        'messages': [serialize_message(message) for message in messages],
+        'next_before_id': next_before_id
+    })
+
+@main.route('/chat/stream')
+@login_required
+def chat_stream():
+    # Server-Sent Events; EventSource reconnects with Last-Event-ID to resume
+    last_id = request.headers.get('Last-Event-ID', request.args.get('last_id'))
+    try:
+        last_id = int(last_id) if last_id is not None else None
+    except ValueError:
+        abort(400)
+    max_streams = current_app.config.get('CHAT_MAX_STREAMS')
+    if max_streams and broker.subscriber_count() >= max_streams:
+        # Each open stream holds a server thread: past the cap, have the
+        # browser reconnect later rather than starve ordinary requests
+        return Response(f'retry: {STREAM_RETRY_MS}\n\n', mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache'})
+    subscription, stream = open_stream(current_user.id, last_id)
+    response = Response(stream, mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    return response
+
+@main.route('/notifications')
+@login_required
+def notifications():
+    items = Notification.query.filter_by(user_id=current_user.id).order_by(
+        Notification.id.desc()
+    ).limit(50).all()
+    return render_template('notifications.html', notifications=items)
+
+@main.route('/notifications/read_all', methods=['POST'])
+@login_required
+def read_all_notifications():
+    marked = mark_all_notifications_read(current_user.id)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'success': True, 'marked': marked})
+    return redirect(url_for('main.notifications'))
+
+@main.route('/api/unread')
+@login_required
+def api_unread():
+    response = jsonify(unread.get(current_user.id))
+    response.cache_control.private = True
+    response.cache_control.max_age = 5
+    return response
+
+@main.route('/admin/analytics')
+@login_required
+@read_replica
+def admin_analytics():
+    if current_user.role != 'admin':
+        return redirect(url_for('main.student_dashboard'))
+    summary = analytics_summary(request.args.get('days', DEFAULT_DAYS, type=int))
+    return render_template('admin_analytics.html', summary=summary)
+
+@main.route('/api/admin/analytics')
+@login_required
+@read_replica
+def api_admin_analytics():
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Admins only'}), 403
+    return jsonify(analytics_summary(request.args.get('days', DEFAULT_DAYS, type=int)))
+
+@main.route('/admin/cache/stats')
+@login_required
+def cache_stats():
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Admins only'}), 403
+    return jsonify({'event_cache': event_cache.stats(), 'fragment_cache': fragment_cache.stats(),
+                    'unread_counters': unread.cache.stats()})
+
+@main.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Admins only'}), 403
+    if not metrics.enabled:
+        return jsonify({'success': False, 'message': 'Metrics are disabled (set METRICS_ENABLED)'}), 404
+    return Response(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
 
-@app.route('/send_message', methods=['POST'])
+@main.route('/send_message', methods=['POST'])
 @login_required
 def send_message():
     content = request.form.get('content')
@@ -239,20 +588,23 @@ def send_message():
         )
         db.session.add(message)
         db.session.commit()
+        unread.incr(message.receiver_id, 'messages')
+        broker.saved(serialize_message(message))
         return jsonify({'success': True})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)})
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
         db.create_all()
         if not User.query.filter_by(username='admin').first():
             admin = User(
                 username='admin',
-                password=generate_password_hash('admin123'),
+                password=passwords.hash('admin123'),
                 role='admin'
             )
             db.session.add(admin)
             db.session.commit()
-    app.run(debug=True)
\ No newline at end of file
+    app.run()
\ No newline at end of file
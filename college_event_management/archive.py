@@ -0,0 +1,113 @@
+import gzip
+import json
+from datetime import datetime
+
+from sqlalchemy import delete, select
+
+from models import (db, Event, Registration, Notification, ArchivedEvent, ArchivedRegistration,
+                    ArchivedNotification)
+from event_cache import event_cache
+from analytics import analytics
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_ARCHIVE_AFTER_DAYS = 180
+# Live tables with one row per (event, something), and where archival moves them
+EVENT_ROW_TABLES = ((Registration, ArchivedRegistration), (Notification, ArchivedNotification))
+
+
+class TableArchive:
+    # Inserts into the archived_* tables in the transaction that deletes the
+    # live rows, so every row is in exactly one of the two
+
+    def write(self, archived_model, rows):
+        db.session.execute(archived_model.__table__.insert(), rows)
+
+    def close(self):
+        pass
+
+
+class FileArchive:
+    # Appends gzip JSON Lines, one {"table": ..., "row": {...}} per row. Each
+    # batch is flushed before the delete commits; if the process dies in
+    # between, the next run writes those rows again, so readers should skip
+    # ids they have already seen.
+
+    def __init__(self, path):
+        self.file = gzip.open(path, 'at', encoding='utf-8')
+
+    def write(self, archived_model, rows):
+        for row in rows:
+            self.file.write(json.dumps({'table': archived_model.__tablename__, 'row': row}, default=_jsonable) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def _jsonable(value):
+    return value.isoformat()
+
+
+def _delete_batches(model, event_id, batch_size):
+    # One short transaction per batch, so the SQLite write lock is released
+    # between batches and other writers get in
+    table = model.__table__
+    deleted = 0
+    while True:
+        batch = select(table.c.id).where(table.c.event_id == event_id).limit(batch_size).scalar_subquery()
+        count = db.session.execute(delete(table).where(table.c.id.in_(batch))).rowcount
+        db.session.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def _move_batches(model, archived_model, event_id, archive, batch_size):
+    table = model.__table__
+    moved = 0
+    while True:
+        rows = db.session.execute(
+            select(table).where(table.c.event_id == event_id).order_by(table.c.id).limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            return moved
+        archive.write(archived_model, [dict(row) for row in rows])
+        db.session.execute(delete(table).where(table.c.id.in_([row['id'] for row in rows])))
+        db.session.commit()
+        moved += len(rows)
+
+
+def delete_event(event_id, batch_size=DEFAULT_BATCH_SIZE):
+    # The large child tables go first in batches; deleting the event row then
+    # cascades to the small ones (waitlist, rollups) and to anything written
+    # for the event in the meantime
+    for model, _ in EVENT_ROW_TABLES:
+        _delete_batches(model, event_id, batch_size)
+    deleted = db.session.execute(delete(Event).where(Event.id == event_id)).rowcount
+    db.session.commit()
+    event_cache.invalidate_event(event_id)
+    return deleted == 1
+
+
+def archive_events(before, batch_size=DEFAULT_BATCH_SIZE, archive=None):
+    # Moves events dated before `before`, oldest first, together with their
+    # registrations and notifications, out of the live tables. Each batch is
+    # its own transaction, so a run can be stopped and resumed at any point.
+    # Returns (events, rows) moved.
+    archive = archive or TableArchive()
+    # Fold pending changes first: the cascade drops an event's deltas with it
+    analytics.compact()
+    events = rows = 0
+    while True:
+        event = db.session.execute(
+            select(Event.__table__).where(Event.date < before).order_by(Event.date, Event.id).limit(1)
+        ).mappings().first()
+        if event is None:
+            return events, rows
+        for model, archived_model in EVENT_ROW_TABLES:
+            rows += _move_batches(model, archived_model, event['id'], archive, batch_size)
+        archive.write(ArchivedEvent, [{**event, 'archived_at': datetime.utcnow()}])
+        db.session.execute(delete(Event).where(Event.id == event['id']))
+        db.session.commit()
+        event_cache.invalidate_event(event['id'])
+        events += 1
@@ -0,0 +1,186 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_HASH_METHOD = 'scrypt'
+DEFAULT_MAX_PENDING = 64
+
+
+class VerifierBusy(Exception):
+    pass
+
+
+def hash_method(password_hash):
+    # 'scrypt:32768:8:1$salt$hash' -> 'scrypt:32768:8:1'
+    return password_hash.split('$', 1)[0]
+
+
+class PasswordHasher:
+    # Hashes and verifies passwords with configurable parameters
+    # (PASSWORD_HASH_METHOD, any werkzeug method string). With
+    # PASSWORD_HASH_WORKERS > 0 the CPU-bound work runs in a process pool so
+    # request threads only wait on it; at most PASSWORD_HASH_MAX_PENDING
+    # hashes are queued, beyond that callers get VerifierBusy instead of
+    # piling up behind the pool.
+
+    def __init__(self, app=None):
+        self.method = DEFAULT_HASH_METHOD
+        self.workers = 0
+        self.max_pending = DEFAULT_MAX_PENDING
+        self.wait_timeout = 5
+        self._method_prefix = None
+        self._dummy_hash = None
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.shutdown()
+        self.method = app.config.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', DEFAULT_MAX_PENDING)
+        self.wait_timeout = app.config.get('PASSWORD_HASH_WAIT_TIMEOUT', self.wait_timeout)
+        self._method_prefix = None
+        self._dummy_hash = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.extensions['password_hasher'] = self
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise VerifierBusy()
+        try:
+            return self._pool().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a threaded server process is not safe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        # Unknown users are checked against a dummy hash with the same
+        # parameters, so they take as long as a wrong password does
+        return self._run(check_password_hash, password_hash or self.dummy_hash(), password) and bool(password_hash)
+
+    def needs_rehash(self, password_hash):
+        return hash_method(password_hash) != self.method_prefix()
+
+    def method_prefix(self):
+        # Werkzeug fills in default parameters ('scrypt' -> 'scrypt:32768:8:1'),
+        # so compare against what the configured method actually produces
+        if self._method_prefix is None:
+            self._method_prefix = hash_method(self.dummy_hash())
+        return self._method_prefix
+
+    def dummy_hash(self):
+        if self._dummy_hash is None:
+            self._dummy_hash = generate_password_hash(os.urandom(16).hex(), self.method)
+        return self._dummy_hash
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+class TokenBucketLimiter:
+    # In-memory token buckets keyed by arbitrary strings: each key holds up to
+    # `capacity` tokens and regains `rate` tokens per second. Per process, and
+    # only the `maxsize` most recently used keys are kept.
+
+    def __init__(self, capacity=10, rate=10 / 60, maxsize=100000):
+        self.capacity = capacity
+        self.rate = rate
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key):
+        # Takes a token; returns 0 when allowed, otherwise the seconds until
+        # the next token is due
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            retry_after = 0 if tokens >= 1 else (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1 if tokens >= 1 else tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def refund(self, key):
+        # Gives back a token taken by consume()
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(self.capacity, tokens + 1), updated)
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class LoginLimiter:
+    # Login attempts are limited per username and per client IP; the IP
+    # bucket is larger since many students can share a campus NAT address.
+    # Only failed attempts count: a successful login refunds its IP token,
+    # so a login storm from one address is never throttled. Behind a reverse
+    # proxy set PROXY_COUNT so the IP is the client's, not the proxy's.
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.users = TokenBucketLimiter(capacity=5, rate=5 / 60)
+        self.ips = TokenBucketLimiter(capacity=50, rate=50 / 60)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('LOGIN_RATE_LIMIT_ENABLED', True)
+        self.users = TokenBucketLimiter(
+            capacity=app.config.get('LOGIN_USER_BURST', 5),
+            rate=app.config.get('LOGIN_USER_PER_MINUTE', 5) / 60
+        )
+        self.ips = TokenBucketLimiter(
+            capacity=app.config.get('LOGIN_IP_BURST', 50),
+            rate=app.config.get('LOGIN_IP_PER_MINUTE', 50) / 60
+        )
+        app.extensions['login_limiter'] = self
+
+    def check(self, username, ip):
+        if not self.enabled:
+            return 0
+        user_wait = self.users.consume(username.lower())
+        if user_wait:
+            return user_wait
+        return self.ips.consume(ip)
+
+    def succeeded(self, username, ip):
+        # A successful login gives the account its full burst back
+        self.users.reset(username.lower())
+        self.ips.refund(ip)
+
+
+passwords = PasswordHasher()
+login_limiter = LoginLimiter()
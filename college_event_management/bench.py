@@ -0,0 +1,1680 @@
+import gzip
+import io
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import click
+from flask import Flask, current_app
+from flask.cli import AppGroup
+from sqlalchemy import event as sa_event, func, select, update, and_
+from werkzeug.security import generate_password_hash
+
+from models import (db, User, Event, Registration, Notification, ChatMessage, WaitlistEntry, EventStats,
+                    DailyStats, AnalyticsDelta, ArchivedEvent, ArchivedRegistration, ArchivedNotification)
+from reservations import reserve_seat, ReservationError
+from waitlist import join_waitlist, cancel_registration, promote, notify_promoted
+from queries import event_page, event_page_query
+from chat_stream import broker, event_stream
+from chat_history import conversation_filter
+from notifications import NotificationPipeline, pipeline
+from event_cache import event_cache
+from fragments import fragment_cache
+from responses import brotli
+from counters import unread
+from cache import make_cache
+from bulk import export_registrations
+from search import search_events, like_search
+from auth import passwords, login_limiter
+from identity import identity
+from analytics import analytics, analytics_summary
+from archive import archive_events, delete_event, FileArchive
+from config import Config
+from database import init_database
+
+# Seeded users get a single-iteration hash so seeding and logins stay cheap
+BENCH_HASH_METHOD = 'pbkdf2:sha256:1'
+
+bench_cli = AppGroup('bench', help='Load tests and benchmarks against a scratch database.')
+
+
+BENCH_CONFIG = {
+    'SECRET_KEY': 'bench',
+    'DEBUG': False,
+    'PASSWORD_HASH_METHOD': BENCH_HASH_METHOD,
+    'LOGIN_RATE_LIMIT_ENABLED': False,
+    # Benchmarks compact explicitly
+    'ANALYTICS_COMPACT_INTERVAL': 0,
+    'SQLITE_PRAGMAS': {**Config.SQLITE_PRAGMAS, 'busy_timeout': 30000},
+}
+
+
+def scratch_app(path, routes=False, **config):
+    # A throwaway app bound to its own SQLite file so benchmarks never touch site.db.
+    # With routes, it is a full app from create_app(); the shared extensions then
+    # point at it until restore_extensions() is called.
+    overrides = {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'SQLALCHEMY_BINDS': {}, **BENCH_CONFIG, **config}
+    if routes:
+        from app import create_app  # app imports this module for its CLI group
+        bench_app = create_app(Config, **overrides)
+    else:
+        bench_app = Flask(__name__)
+        bench_app.config.from_object(Config)
+        bench_app.config.update(overrides)
+        init_database(bench_app)
+    # Process-wide caches hold rows from whatever database ran before
+    event_cache.backend.clear()
+    fragment_cache.backend.clear()
+    unread.cache.clear()
+    identity.cache.clear()
+    with bench_app.app_context():
+        db.create_all()
+    return bench_app
+
+
+def restore_extensions(app):
+    # Point the shared extensions back at the real app after a routes bench
+    pipeline.init_app(app)
+    event_cache.init_app(app)
+    fragment_cache.init_app(app)
+    broker.init_app(app)
+    passwords.init_app(app)
+    login_limiter.init_app(app)
+    analytics.init_app(app)
+
+
+@contextmanager
+def count_statements(engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sa_event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        sa_event.remove(engine, 'before_cursor_execute', record)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def query_plan(statement):
+    compiled = statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params).all()
+    return ' | '.join(row[-1] for row in rows)
+
+
+def login_as(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+def bulk_insert(model, rows, chunk_size=50000):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            db.session.execute(model.__table__.insert(), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(model.__table__.insert(), chunk)
+    db.session.commit()
+
+
+def seed_students(count):
+    password = generate_password_hash('bench', method=BENCH_HASH_METHOD)
+    db.session.execute(User.__table__.insert(), [
+        {'username': f'student{i}', 'password': password, 'role': 'student'}
+        for i in range(count)
+    ])
+    db.session.commit()
+    return [row[0] for row in db.session.query(User.id).filter_by(role='student')]
+
+
+@bench_cli.command('register')
+@click.option('--workers', default=50, show_default=True, help='Concurrent worker threads.')
+@click.option('--students', default=1000, show_default=True, help='Students competing for seats.')
+@click.option('--seats', default=200, show_default=True, help='Seats on the contested event.')
+def bench_register(workers, students, seats):
+    """Hammer reserve_seat from many threads and check for overselling."""
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = scratch_app(os.path.join(tmp, 'bench.db'))
+        with bench_app.app_context():
+            user_ids = seed_students(students)
+            contested = Event(name='Fest', date=datetime.utcnow() + timedelta(days=7), max_seats=seats)
+            db.session.add(contested)
+            db.session.commit()
+            event_id = contested.id
+
+        # Every student tries twice to also exercise the duplicate guard
+        attempts = user_ids + user_ids
+        lock = threading.Lock()
+        outcome = {'ok': 0, 'rejected': 0, 'errors': 0}
+        error_messages = []
+
+        def worker(chunk):
+            with bench_app.app_context():
+                for user_id in chunk:
+                    contested = db.session.get(Event, event_id)
+                    try:
+                        reserve_seat(user_id, contested)
+                        key = 'ok'
+                    except ReservationError:
+                        key = 'rejected'
+                    except Exception as e:
+                        db.session.rollback()
+                        key = 'errors'
+                        with lock:
+                            error_messages.append(repr(e))
+                    with lock:
+                        outcome[key] += 1
+
+        threads = [threading.Thread(target=worker, args=(attempts[i::workers],)) for i in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with bench_app.app_context():
+            rows = Registration.query.filter_by(event_id=event_id).count()
+            duplicates = rows - db.session.query(Registration.user_id).filter_by(event_id=event_id).distinct().count()
+            seats_taken = db.session.get(Event, event_id).seats_taken
+
+    click.echo(f'workers={workers} attempts={len(attempts)} elapsed={elapsed:.2f}s')
+    click.echo(f'registered={outcome["ok"]} rejected={outcome["rejected"]} errors={outcome["errors"]}')
+    click.echo(f'attempts/sec={len(attempts) / elapsed:.0f} registrations/sec={outcome["ok"] / elapsed:.0f}')
+    click.echo(f'rows={rows} seats_taken={seats_taken} max_seats={seats} duplicates={duplicates}')
+    if rows > seats or rows != seats_taken or duplicates:
+        raise click.ClickException('Seat invariant violated')
+    if outcome['errors']:
+        # Duplicates and full events must surface as ReservationError, never as raw DB errors
+        raise click.ClickException(f'{outcome["errors"]} unexpected errors, first: {error_messages[0]}')
+    click.echo('OK: no overselling')
+
+
+@bench_cli.command('waitlist')
+@click.option('--workers', default=16, show_default=True, help='Concurrent worker threads.')
+@click.option('--seats', default=100, show_default=True, help='Seats on the event, all taken at the start.')
+@click.option('--waiting', default=500, show_default=True, help='Students queued before the run.')
+@click.option('--cancellations', default=300, show_default=True)
+@click.option('--joiners', default=100, show_default=True, help='Students joining the queue during the run.')
+@click.option('--raises', default=5, show_default=True, help='Times max_seats goes up by 10 during the run.')
+def bench_waitlist(workers, seats, waiting, cancellations, joiners, raises):
+    """Concurrent cancellations, joins and capacity raises on one waitlisted event."""
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = scratch_app(os.path.join(tmp, 'bench.db'))
+        with bench_app.app_context():
+            user_ids = seed_students(seats + waiting + joiners)
+            holders, queued, newcomers = user_ids[:seats], user_ids[seats:seats + waiting], user_ids[seats + waiting:]
+            contested = Event(name='Fest', date=datetime.utcnow() + timedelta(days=7), max_seats=seats,
+                              seats_taken=seats)
+            db.session.add(contested)
+            db.session.commit()
+            event_id = contested.id
+            now = datetime.utcnow()
+            bulk_insert(Registration, ({'user_id': user_id, 'event_id': event_id, 'payment_amount': 0.0,
+                                        'payment_status': True, 'is_confirmed': True, 'registration_date': now}
+                                       for user_id in holders))
+            bulk_insert(WaitlistEntry, ({'user_id': user_id, 'event_id': event_id, 'position': position,
+                                         'created_at': now} for position, user_id in enumerate(queued, 1)))
+
+        rng = random.Random(0)
+        tasks = [('cancel', None)] * cancellations + [('join', user_id) for user_id in newcomers] + [('raise', None)] * raises
+        rng.shuffle(tasks)
+        lock = threading.Lock()
+        seat_holders = list(holders)
+        promoted_users = []
+        timings = {'cancel': [], 'join': [], 'raise': []}
+        outcome = {'skipped': 0, 'errors': 0}
+        error_samples = set()
+
+        def run(kind, user_id):
+            if kind == 'cancel':
+                with lock:
+                    if not seat_holders:
+                        return None
+                    user_id = seat_holders.pop(rng.randrange(len(seat_holders)))
+                return cancel_registration(user_id, event_id)
+            if kind == 'join':
+                return [user_id] if join_waitlist(user_id, event_id) is None else []
+            # What edit_event does when an admin adds seats
+            db.session.execute(update(Event).where(Event.id == event_id).values(max_seats=Event.max_seats + 10))
+            promoted = promote(event_id)
+            db.session.commit()
+            notify_promoted(promoted)
+            return promoted
+
+        def worker(chunk):
+            with bench_app.app_context():
+                for kind, user_id in chunk:
+                    started = time.perf_counter()
+                    try:
+                        promoted = run(kind, user_id)
+                    except Exception as e:
+                        db.session.rollback()
+                        with lock:
+                            outcome['errors'] += 1
+                            error_samples.add(str(e).splitlines()[0])
+                        continue
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        if promoted is None:
+                            outcome['skipped'] += 1
+                            continue
+                        timings[kind].append(elapsed)
+                        promoted_users.extend(promoted)
+                        # Promoted students can cancel again later in the run
+                        seat_holders.extend(promoted)
+
+        threads = [threading.Thread(target=worker, args=(tasks[i::workers],)) for i in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with bench_app.app_context():
+            contested = db.session.get(Event, event_id)
+            registered = {row[0] for row in db.session.query(Registration.user_id).filter_by(event_id=event_id)}
+            rows = Registration.query.filter_by(event_id=event_id).count()
+            waiters = {row[0] for row in db.session.query(WaitlistEntry.user_id).filter_by(event_id=event_id)}
+            notified = Notification.query.filter(Notification.event_id == event_id,
+                                                 Notification.message.like('A seat opened up%')).count()
+            max_seats, seats_taken = contested.max_seats, contested.seats_taken
+
+    ops = sum(len(values) for values in timings.values())
+    click.echo(f'workers={workers} operations={ops} skipped={outcome["skipped"]} errors={outcome["errors"]} '
+               f'elapsed={elapsed:.2f}s ops/sec={ops / elapsed:.0f}')
+    for kind, values in timings.items():
+        values.sort()
+        click.echo(f'{kind:7} n={len(values):4} p50={percentile(values, 50) * 1000:6.2f}ms '
+                   f'p95={percentile(values, 95) * 1000:6.2f}ms')
+    for sample in sorted(error_samples):
+        click.echo(f'error: {sample}', err=True)
+
+    promoted = set(promoted_users)
+    promoted_queued = [user_id in promoted for user_id in queued]
+    problems = []
+    if rows != seats_taken or seats_taken > max_seats:
+        problems.append(f'rows={rows} seats_taken={seats_taken} max_seats={max_seats}')
+    if len(promoted) != len(promoted_users):
+        problems.append('a student was promoted twice')
+    if registered & waiters:
+        problems.append(f'{len(registered & waiters)} students are both registered and waiting')
+    if waiters and seats_taken < max_seats:
+        problems.append(f'{max_seats - seats_taken} free seats while {len(waiters)} students wait')
+    # FIFO: the promoted part of the initial queue is a prefix of it, and
+    # nobody who joined during the run got in before that queue was drained
+    if promoted_queued != sorted(promoted_queued, reverse=True):
+        problems.append('promotions skipped ahead in the queue')
+    if promoted - set(queued) and not all(promoted_queued):
+        problems.append('a newcomer was promoted ahead of the initial queue')
+    if notified != len(promoted_users):
+        problems.append(f'{notified} promotion notifications for {len(promoted_users)} promotions')
+    if outcome['errors']:
+        problems.append(f'{outcome["errors"]} operations failed')
+    click.echo(f'promoted={len(promoted_users)} still_waiting={len(waiters)} '
+               f'seats_taken={seats_taken} max_seats={max_seats}')
+    if problems:
+        raise click.ClickException('Waitlist invariant violated: ' + '; '.join(problems))
+    click.echo('OK: no overselling, FIFO order kept, one notification per promotion')
+
+
+def seed_events(count, registrations_per_event, user_ids):
+    now = datetime.utcnow()
+    bulk_insert(Event, (
+        {'name': f'Event {i}', 'description': 'Synthetic event', 'location': 'Main hall',
+         'date': now + timedelta(hours=i - count // 2), 'max_seats': max(registrations_per_event * 2, 100),
+         'registration_fee': 10.0, 'seats_taken': registrations_per_event}
+        for i in range(count)
+    ))
+    event_ids = [row[0] for row in db.session.query(Event.id)]
+    bulk_insert(Registration, (
+        {'user_id': user_id, 'event_id': event_id, 'payment_amount': 10.0,
+         'payment_status': True, 'is_confirmed': True, 'registration_date': now}
+        for event_id in event_ids
+        for user_id in user_ids[:registrations_per_event]
+    ))
+    return event_ids
+
+
+@bench_cli.command('dashboard')
+@click.option('--events', default=500, show_default=True)
+@click.option('--registrations', default=100000, show_default=True, help='Total registrations to seed.')
+def bench_dashboard(events, registrations):
+    """Check that dashboards issue a constant number of SQL statements."""
+    per_event = max(registrations // events, 1)
+    results = {}
+    for label, event_count, seats in (('small', 2, 2), ('large', events, per_event)):
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_app = scratch_app(os.path.join(tmp, 'bench.db'), routes=True)
+            with bench_app.app_context():
+                user_ids = seed_students(seats)
+                seed_events(event_count, seats, user_ids)
+                admin = User(username='admin', password='-', role='admin')
+                db.session.add(admin)
+                db.session.commit()
+                accounts = {'admin': admin.id, 'student': user_ids[0]}
+                engine = db.engine
+            for role, path in (('admin', '/admin/dashboard'), ('student', '/student/dashboard')):
+                client = bench_app.test_client()
+                login_as(client, accounts[role])
+                with count_statements(engine) as statements:
+                    started = time.perf_counter()
+                    response = client.get(path)
+                    elapsed = time.perf_counter() - started
+                if response.status_code != 200:
+                    raise click.ClickException(f'{path} returned {response.status_code}')
+                results[label, path] = len(statements)
+                click.echo(f'{label:5} {path:20} events={event_count} registrations={event_count * seats} '
+                           f'statements={len(statements)} time={elapsed * 1000:.0f}ms '
+                           f'bytes={len(response.data)}')
+    for path in ('/admin/dashboard', '/student/dashboard'):
+        if results['small', path] != results['large', path]:
+            raise click.ClickException(f'{path} statement count grows with data')
+    click.echo('OK: statement count is independent of data size')
+
+
+@bench_cli.command('events')
+@click.option('--sizes', default='10000,100000,1000000', show_default=True,
+              help='Comma-separated event table sizes.')
+@click.option('--pages', default=200, show_default=True, help='Pages timed per size.')
+def bench_events(sizes, pages):
+    """Time keyset pages of the event listing as the events table grows."""
+    for size in [int(n) for n in sizes.split(',')]:
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_app = scratch_app(os.path.join(tmp, 'bench.db'))
+            with bench_app.app_context():
+                now = datetime.now()
+                bulk_insert(Event, (
+                    {'name': f'Event {i}', 'date': now + timedelta(minutes=i - size // 2),
+                     'location': 'Main hall', 'max_seats': 100, 'seats_taken': 0}
+                    for i in range(size)
+                ))
+
+                rows, cursor = event_page('upcoming', now=now)
+                for scope in ('upcoming', 'past'):
+                    plan = query_plan(event_page_query(scope, cursor, now).limit(21).statement)
+                    if 'ix_event_date_id' not in plan:
+                        raise click.ClickException(f'{scope} listing does not use ix_event_date_id: {plan}')
+
+                for scope in ('upcoming', 'past'):
+                    cursor, timings = None, []
+                    for _ in range(pages):
+                        started = time.perf_counter()
+                        rows, cursor = event_page(scope, cursor, now=now)
+                        timings.append(time.perf_counter() - started)
+                        if cursor is None:
+                            break
+                    timings.sort()
+                    click.echo(f'events={size:>8} scope={scope:8} pages={len(timings)} '
+                               f'min={timings[0] * 1000:.2f}ms p50={timings[len(timings) // 2] * 1000:.2f}ms '
+                               f'max={timings[-1] * 1000:.2f}ms')
+
+
+
+# Statements issued by the hot routes, paired with what their query plan must mention.
+# SQLite names the index behind uq_registration_user_event itself, so match its columns.
+HOT_QUERIES = [
+    ('view_event', '(user_id=? AND event_id=?)', lambda ids: select(Registration.id).where(
+        Registration.user_id == ids['user'], Registration.event_id == ids['event']).limit(1)),
+    ('register_event', 'ix_registration_event_id', lambda ids: select(func.count(Registration.id)).where(
+        Registration.event_id == ids['event'])),
+    ('chat', 'ix_chat_message_sender_id_receiver_id', lambda ids: select(ChatMessage.id).where(
+        conversation_filter(ids['user'])).order_by(ChatMessage.id.desc()).limit(51)),
+    # Both directions pin sender and receiver, so either composite index serves
+    # them; which one SQLite picks depends on index creation order
+    ('admin_chat', 'COVERING INDEX ix_chat_message_', lambda ids: select(ChatMessage.id).where(
+        conversation_filter(1, ids['user'])).order_by(ChatMessage.id.desc()).limit(51)),
+    ('notifications', 'ix_notification_user_id_is_read', lambda ids: select(func.count(Notification.id)).where(
+        and_(Notification.user_id == ids['user'], Notification.is_read == False))),
+]
+
+HOT_INDEXES = [
+    'ix_registration_event_id',
+    'ix_chat_message_sender_id_receiver_id',
+    'ix_chat_message_receiver_id_sender_id',
+    'ix_notification_user_id_is_read',
+]
+
+
+def seed_hot_tables(rows):
+    now = datetime.utcnow()
+    events = max(rows // 100, 1)
+    students = max(rows // 10, 100)
+    password = generate_password_hash('bench', method=BENCH_HASH_METHOD)
+    bulk_insert(User, ({'username': f'student{i}', 'password': password, 'role': 'student'}
+                       for i in range(students)))
+    bulk_insert(Event, ({'name': f'Event {i}', 'date': now + timedelta(hours=i), 'location': 'Main hall',
+                         'max_seats': 1000, 'seats_taken': 0} for i in range(events)))
+    # Event ids cycle fastest so every (user, event) pair is unique
+    bulk_insert(Registration, ({'user_id': i // events + 1, 'event_id': i % events + 1, 'payment_amount': 0.0,
+                                'payment_status': True, 'is_confirmed': True, 'registration_date': now}
+                               for i in range(rows)))
+    bulk_insert(Notification, ({'user_id': i % students + 1, 'event_id': i % events + 1, 'message': 'Update',
+                                'is_read': i % 3 == 0, 'created_at': now} for i in range(rows)))
+    # Students write to the admin (id 1) and the admin replies on every other message
+    bulk_insert(ChatMessage, ({'sender_id': 1 if i % 2 else i % students + 1,
+                               'receiver_id': i % students + 1 if i % 2 else 1, 'content': 'Hello',
+                               'timestamp': now + timedelta(seconds=i), 'is_read': False} for i in range(rows)))
+    return students, events
+
+
+def time_hot_queries(samples, repeat):
+    timings = {}
+    connection = db.session.connection()
+    for name, expected, build in HOT_QUERIES:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for ids in samples:
+                connection.execute(build(ids)).all()
+        timings[name] = (time.perf_counter() - started) / (repeat * len(samples))
+    return timings
+
+
+@bench_cli.command('indexes')
+@click.option('--sizes', default='10000,100000,1000000', show_default=True,
+              help='Comma-separated row counts seeded into each hot table.')
+@click.option('--samples', default=20, show_default=True, help='Random ids looked up per query.')
+@click.option('--repeat', default=3, show_default=True)
+def bench_indexes(sizes, samples, repeat):
+    """Time hot-path queries without and with the hot-path indexes and check their plans."""
+    for size in [int(n) for n in sizes.split(',')]:
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_app = scratch_app(os.path.join(tmp, 'bench.db'))
+            with bench_app.app_context():
+                students, events = seed_hot_tables(size)
+                rng = random.Random(size)
+                # Ids 2..students are senders; id 1 plays the admin inbox
+                ids = [{'user': rng.randint(2, students), 'event': rng.randint(1, events)} for _ in range(samples)]
+                indexes = {index.name: index for table in db.metadata.tables.values() for index in table.indexes}
+
+                for name in HOT_INDEXES:
+                    indexes[name].drop(db.engine)
+                before = time_hot_queries(ids, repeat)
+                for name in HOT_INDEXES:
+                    indexes[name].create(db.engine)
+                db.session.execute(db.text('ANALYZE'))
+                after = time_hot_queries(ids, repeat)
+
+                for name, expected, build in HOT_QUERIES:
+                    plan = query_plan(build(ids[0]))
+                    if expected not in plan:
+                        raise click.ClickException(f'{name} plan does not mention {expected}: {plan}')
+                    click.echo(f'rows={size:>8} {name:15} before={before[name] * 1000:8.3f}ms '
+                               f'after={after[name] * 1000:8.3f}ms speedup={before[name] / after[name]:7.1f}x')
+    click.echo('OK: every hot query uses its index')
+
+
+@bench_cli.command('chat')
+@click.option('--clients', default=500, show_default=True, help='Open student chat streams.')
+@click.option('--messages', default=5000, show_default=True, help='Messages published in total.')
+@click.option('--rate', default=1000, show_default=True, help='Target messages per second.')
+def bench_chat(clients, messages, rate):
+    """Measure broker-to-stream delivery latency with many open chats."""
+    admin_id = 1
+    student_ids = list(range(2, clients + 2))
+    latencies = []
+    lock = threading.Lock()
+    subscriptions = [broker.subscribe(user_id) for user_id in [admin_id] + student_ids]
+
+    def consume(subscription):
+        received = []
+        for chunk in event_stream(subscription, [], 0):
+            if chunk.startswith('id:'):
+                message = json.loads(chunk.split('data: ', 1)[1])
+                received.append(time.perf_counter() - message['sent_at'])
+        with lock:
+            latencies.extend(received)
+
+    threads = [threading.Thread(target=consume, args=(subscription,)) for subscription in subscriptions]
+    for thread in threads:
+        thread.start()
+
+    started = time.perf_counter()
+    for message_id in range(1, messages + 1):
+        due = started + message_id / rate
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        sender = student_ids[message_id % clients]
+        broker.publish({'id': message_id, 'sender_id': sender, 'receiver_id': admin_id, 'sender': f'student{sender}',
+                        'content': 'Hello', 'timestamp': '', 'sent_at': time.perf_counter()})
+    elapsed = time.perf_counter() - started
+
+    time.sleep(0.5)
+    for subscription in subscriptions:
+        subscription.closed = True
+        # An already-seen id wakes the stream so it notices it is closed
+        subscription.queue.put({'id': 0})
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    click.echo(f'clients={clients} messages={messages} deliveries={len(latencies)} '
+               f'published/sec={messages / elapsed:.0f}')
+    click.echo(f'latency p50={percentile(latencies, 50) * 1000:.2f}ms p95={percentile(latencies, 95) * 1000:.2f}ms '
+               f'p99={percentile(latencies, 99) * 1000:.2f}ms max={latencies[-1] * 1000:.2f}ms')
+    if len(latencies) != messages * 2:
+        raise click.ClickException(f'Expected {messages * 2} deliveries, got {len(latencies)}')
+
+
+@bench_cli.command('notify')
+@click.option('--recipients', default=10000, show_default=True, help='Registrants on the updated event.')
+@click.option('--batch-size', default=1000, show_default=True)
+def bench_notify(recipients, batch_size):
+    """Compare pipeline fan-out throughput with inline per-row ORM inserts."""
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = scratch_app(os.path.join(tmp, 'bench.db'))
+        bench_pipeline = NotificationPipeline(bench_app, batch_size=batch_size)
+        with bench_app.app_context():
+            user_ids = seed_students(recipients)
+            event_ids = seed_events(2, recipients, user_ids)
+
+            started = time.perf_counter()
+            for user_id in user_ids:
+                db.session.add(Notification(user_id=user_id, event_id=event_ids[0], message='Inline update'))
+            db.session.commit()
+            inline = time.perf_counter() - started
+
+            started = time.perf_counter()
+            job = bench_pipeline.enqueue_event_fanout(event_ids[1], 'Pipeline update')
+            enqueued = time.perf_counter() - started
+        job.finished.wait()
+        elapsed = time.perf_counter() - started
+
+        with bench_app.app_context():
+            delivered = Notification.query.filter_by(event_id=event_ids[1]).count()
+            recorded = bench_pipeline.job(job.id)
+
+    click.echo(f'recipients={recipients} batch_size={batch_size} status={job.status}')
+    click.echo(f'inline ORM: {inline:.2f}s ({recipients / inline:.0f} rows/sec, blocks the request)')
+    click.echo(f'pipeline:   {elapsed:.2f}s ({recipients / elapsed:.0f} rows/sec, '
+               f'request blocked {enqueued * 1000:.2f}ms)')
+    if job.status != 'done' or delivered != recipients:
+        raise click.ClickException(f'Expected {recipients} notifications, found {delivered} ({job.error})')
+    if (recorded['status'], recorded['sent'], recorded['total']) != ('done', recipients, recipients):
+        raise click.ClickException(f'Job row does not match the run: {recorded}')
+
+
+@bench_cli.command('event-cache')
+@click.option('--events', default=1000, show_default=True)
+@click.option('--requests', 'request_count', default=5000, show_default=True, help='Requests per run.')
+@click.option('--backend', default='memory', show_default=True, help='Cache backend for the cached run.')
+def bench_event_cache(events, request_count, backend):
+    """Requests/sec on /event/<id> with the event cache off and on."""
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = scratch_app(os.path.join(tmp, 'bench.db'), routes=True)
+        with bench_app.app_context():
+            user_ids = seed_students(1)
+            event_ids = seed_events(events, 0, user_ids)
+            engine = db.engine
+        client = bench_app.test_client()
+        login_as(client, user_ids[0])
+        rng = random.Random(0)
+        paths = [f'/event/{rng.choice(event_ids)}' for _ in range(request_count)]
+
+        original = event_cache.backend
+        try:
+            for label, cache_backend in (('off', 'null'), ('on', backend)):
+                event_cache.backend = make_cache(cache_backend, ttl=300,
+                                                 location=os.path.join(tmp, 'cache'))
+                with count_statements(engine) as statements:
+                    started = time.perf_counter()
+                    for path in paths:
+                        if client.get(path).status_code != 200:
+                            raise click.ClickException(f'{path} failed')
+                    elapsed = time.perf_counter() - started
+                stats = event_cache.stats()
+                click.echo(f'cache={label:3} backend={stats["backend"]:9} requests/sec={request_count / elapsed:7.0f} '
+                           f'statements/request={len(statements) / request_count:.2f} '
+                           f'hits={stats["hits"]} misses={stats["misses"]} hit_rate={stats["hit_rate"]:.2%}')
+        finally:
+            event_cache.backend = original
+
+
+@bench_cli.command('export')
+@click.option('--sizes', default='100000,1000000', show_default=True, help='Comma-separated registration counts.')
+def bench_export(sizes):
+    """Check that streaming a registrations export uses constant memory."""
+    peaks = []
+    for size in [int(n) for n in sizes.split(',')]:
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_app = scratch_app(os.path.join(tmp, 'bench.db'))
+            with bench_app.app_context():
+                events = max(size // 1000, 1)
+                user_ids = seed_students(size // events)
+                seed_events(events, size // events, user_ids)
+                db.session.remove()
+
+                tracemalloc.start()
+                started = time.perf_counter()
+                written = 0
+                for chunk in export_registrations():
+                    written += len(chunk)
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        peaks.append(peak)
+        click.echo(f'registrations={size:>8} bytes={written:>11} time={elapsed:.1f}s '
+                   f'rows/sec={size / elapsed:.0f} peak_python_memory={peak / 1024:.0f}KiB')
+    if max(peaks) > 4 * min(peaks):
+        raise click.ClickException('Export memory grows with the result size')
+    click.echo('OK: export memory does not grow with the result size')
+
+
+SEED_DEFAULTS = {'users': 1000, 'events': 200, 'registrations': 20000, 'notifications': 20000, 'messages': 20000}
+
+
+def seed_volumes(users, events, registrations, notifications, messages):
+    # Bulk-insert a synthetic data set; user 1 is the admin, as send_message assumes
+    now = datetime.now()
+    password = generate_password_hash('bench', method=BENCH_HASH_METHOD)
+    if registrations > users * events:
+        raise click.ClickException('registrations cannot exceed users * events')
+    bulk_insert(User, [{'username': 'admin', 'password': password, 'role': 'admin'}])
+    bulk_insert(User, ({'username': f'student{i}', 'password': password, 'role': 'student'}
+                       for i in range(users)))
+    # Half the events are upcoming, half are past
+    bulk_insert(Event, ({'name': f'Event {i}', 'description': 'Synthetic event', 'location': 'Main hall',
+                         'date': now + timedelta(days=i - events // 2), 'max_seats': users + 100,
+                         'registration_fee': 10.0, 'seats_taken': 0} for i in range(events)))
+    # Event ids cycle fastest so every (user, event) pair is unique
+    bulk_insert(Registration, ({'user_id': i // events + 2, 'event_id': i % events + 1, 'payment_amount': 10.0,
+                                'payment_status': True, 'is_confirmed': True, 'registration_date': now}
+                               for i in range(registrations)))
+    db.session.execute(db.text(
+        'UPDATE event SET seats_taken = '
+        '(SELECT COUNT(*) FROM registration WHERE registration.event_id = event.id)'
+    ))
+    analytics.rebuild()
+    bulk_insert(Notification, ({'user_id': i % users + 2, 'event_id': i % events + 1, 'message': 'Update',
+                                'is_read': i % 3 == 0, 'created_at': now} for i in range(notifications)))
+    # Students write to the admin and the admin replies on every other message
+    bulk_insert(ChatMessage, ({'sender_id': 1 if i % 2 else i % users + 2,
+                               'receiver_id': i % users + 2 if i % 2 else 1, 'content': 'Hello',
+                               'timestamp': now - timedelta(seconds=messages - i), 'is_read': i % 4 == 0}
+                              for i in range(messages)))
+
+
+def volume_options(command):
+    for name, default in reversed(SEED_DEFAULTS.items()):
+        command = click.option(f'--{name}', default=default, show_default=True)(command)
+    return command
+
+
+@bench_cli.command('seed')
+@click.argument('database', type=click.Path(dir_okay=False))
+@volume_options
+def bench_seed(database, **volumes):
+    """Create DATABASE (a SQLite file) filled with synthetic rows."""
+    if os.path.exists(database):
+        raise click.ClickException(f'{database} already exists')
+    bench_app = scratch_app(os.path.abspath(database))
+    started = time.perf_counter()
+    with bench_app.app_context():
+        seed_volumes(**volumes)
+    click.echo(f'Seeded {database} in {time.perf_counter() - started:.1f}s: '
+               + ', '.join(f'{name}={count}' for name, count in volumes.items()))
+
+
+class RouteCase:
+    # One request per iteration; path and data may be callables of (ctx, iteration)
+
+    def __init__(self, endpoint, path, role='student', method='GET', data=None, expect=(200, 302)):
+        self.endpoint = endpoint
+        self.path = path
+        self.role = role
+        self.method = method
+        self.data = data
+        self.expect = expect
+
+    @property
+    def name(self):
+        return f'{self.method} {self.endpoint}'
+
+    def request(self, client, ctx, iteration):
+        path = self.path(ctx, iteration) if callable(self.path) else self.path
+        data = self.data(ctx, iteration) if callable(self.data) else self.data
+        return client.open(path, method=self.method, data=data)
+
+
+def _event_form(ctx, i):
+    return {'name': f'Bench event {i}', 'description': 'Created by bench', 'date': ctx['future'],
+            'location': 'Lab', 'max_seats': '50', 'registration_fee': '0'}
+
+
+ROUTE_CASES = [
+    RouteCase('home', '/', role=None),
+    RouteCase('login', '/login', role=None),
+    RouteCase('login', '/login', role=None, method='POST',
+              data=lambda ctx, i: {'username': f'student{i % ctx["users"]}', 'password': 'bench'}),
+    RouteCase('register', '/register', role=None),
+    RouteCase('register', '/register', role=None, method='POST',
+              data=lambda ctx, i: {'username': f'bench-new-{ctx["run"]}-{i}', 'password': 'bench'}),
+    RouteCase('admin_dashboard', '/admin/dashboard', role='admin'),
+    RouteCase('student_dashboard', '/student/dashboard'),
+    RouteCase('api_events', '/api/events?scope=upcoming&limit=50'),
+    RouteCase('search', '/events/search?q=event'),
+    RouteCase('api_search_events', '/api/events/search?q=even&limit=20'),
+    RouteCase('view_event', lambda ctx, i: f'/event/{ctx["event_ids"][i % len(ctx["event_ids"])]}'),
+    RouteCase('create_event', '/create_event', role='admin'),
+    RouteCase('create_event', '/create_event', role='admin', method='POST', data=_event_form),
+    RouteCase('edit_event', lambda ctx, i: f'/edit_event/{ctx["event_ids"][0]}', role='admin'),
+    RouteCase('edit_event', lambda ctx, i: f'/edit_event/{ctx["event_ids"][0]}', role='admin', method='POST',
+              data=_event_form),
+    RouteCase('notify_registrants', lambda ctx, i: f'/admin/events/{ctx["event_ids"][1]}/notify', role='admin',
+              method='POST', data={'message': 'Bench notice'}, expect=(202,)),
+    RouteCase('notify_job_status', '/admin/notify_jobs/1', role='admin', expect=(200, 404)),
+    RouteCase('import_events_upload', '/admin/events/import', role='admin', method='POST',
+              data=lambda ctx, i: {'file': (io.BytesIO(
+                  f'name,date\nImported {i},{ctx["future"]}\n'.encode()), 'events.csv')}),
+    RouteCase('export_registrations_download',
+              lambda ctx, i: f'/admin/registrations/export?event_id={ctx["event_ids"][0]}', role='admin'),
+    RouteCase('delete_event', lambda ctx, i: f'/delete_event/{ctx["spare_event_ids"][i]}', role='admin',
+              method='POST'),
+    RouteCase('register_event', lambda ctx, i: f'/register_event/{ctx["spare_event_ids"][-1]}'),
+    RouteCase('register_event', lambda ctx, i: f'/register_event/{ctx["spare_event_ids"][-1]}', method='POST'),
+    # Cancels the registrations the case above made
+    RouteCase('cancel_event_registration', lambda ctx, i: f'/register_event/{ctx["spare_event_ids"][-1]}/cancel',
+              method='POST'),
+    RouteCase('leave_event_waitlist', lambda ctx, i: f'/waitlist/{ctx["event_ids"][0]}/leave', method='POST'),
+    RouteCase('chat', '/chat'),
+    RouteCase('admin_chat', '/admin/chat', role='admin'),
+    RouteCase('api_chat_messages', '/api/chat/messages'),
+    RouteCase('notifications', '/notifications'),
+    RouteCase('read_all_notifications', '/notifications/read_all', method='POST'),
+    RouteCase('api_unread', '/api/unread'),
+    RouteCase('admin_analytics', '/admin/analytics', role='admin'),
+    RouteCase('api_admin_analytics', '/api/admin/analytics?days=365', role='admin'),
+    RouteCase('cache_stats', '/admin/cache/stats', role='admin'),
+    RouteCase('admin_metrics', '/admin/metrics', role='admin', expect=(200, 404)),
+    RouteCase('send_message', '/send_message', method='POST', data={'content': 'Bench message'}),
+    RouteCase('logout', '/logout'),
+]
+
+# Endpoints that cannot be driven as a single request/response
+SKIPPED_ENDPOINTS = {'chat_stream': 'infinite event stream'}
+
+
+def run_route_cases(bench_app, ctx, iterations, cases):
+    with bench_app.app_context():
+        engine = db.engine
+    results = {}
+    for case in cases:
+        latencies, statement_counts, peak = [], [], 0
+        # Latency pass without tracemalloc, whose overhead would skew timings
+        for iteration in range(iterations + 1):
+            client = bench_app.test_client()
+            if case.role is not None:
+                login_as(client, ctx['accounts'][case.role][iteration % len(ctx['accounts'][case.role])])
+            with count_statements(engine) as statements:
+                started = time.perf_counter()
+                response = case.request(client, ctx, iteration)
+                response.get_data()
+                elapsed = time.perf_counter() - started
+            if response.status_code not in case.expect:
+                raise click.ClickException(f'{case.name} returned {response.status_code}')
+            if iteration:
+                # The first request warms caches and is left out
+                latencies.append(elapsed)
+                statement_counts.append(len(statements))
+        client = bench_app.test_client()
+        if case.role is not None:
+            login_as(client, ctx['accounts'][case.role][0])
+        tracemalloc.start()
+        case.request(client, ctx, iterations + 1).get_data()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        latencies.sort()
+        results[case.name] = {
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'statements': round(sum(statement_counts) / len(statement_counts), 2),
+            'max_statements': max(statement_counts),
+            'peak_kib': round(peak / 1024, 1),
+        }
+    return results
+
+
+def compare_baseline(results, baseline, tolerance):
+    regressions = []
+    for name, current in results.items():
+        previous = baseline['routes'].get(name)
+        if previous is None:
+            click.echo(f'{name:45} new route')
+            continue
+        notes = []
+        if current['max_statements'] > previous['max_statements']:
+            notes.append(f'statements {previous["max_statements"]} -> {current["max_statements"]}')
+        # Absolute slack so sub-millisecond routes do not flag on scheduler noise
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance) + 1.0:
+            notes.append(f'p95 {previous["p95_ms"]:.2f} -> {current["p95_ms"]:.2f}ms')
+        if current['peak_kib'] > previous['peak_kib'] * (1 + tolerance) + 64:
+            notes.append(f'peak memory {previous["peak_kib"]:.0f} -> {current["peak_kib"]:.0f}KiB')
+        if notes:
+            regressions.append(name)
+            click.echo(f'{name:45} REGRESSION: ' + '; '.join(notes))
+    return regressions
+
+
+@bench_cli.command('routes')
+@click.option('--database', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='A database made by "flask bench seed"; otherwise a fresh one is seeded.')
+@click.option('--iterations', default=50, show_default=True, help='Timed requests per route.')
+@click.option('--only', multiple=True, help='Limit to these endpoints.')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Write results as a JSON baseline.')
+@click.option('--compare', 'compare_to', type=click.File('r'), default=None, help='Baseline JSON to compare against.')
+@click.option('--tolerance', default=0.25, show_default=True, help='Allowed p95/memory growth before flagging.')
+@volume_options
+def bench_routes(database, iterations, only, output, compare_to, tolerance, **volumes):
+    """Profile every route: latency percentiles, SQL statements and peak memory."""
+    covered = {case.endpoint for case in ROUTE_CASES} | set(SKIPPED_ENDPOINTS)
+    for rule in current_app.url_map.iter_rules():
+        # Cases name views without the blueprint prefix
+        endpoint = rule.endpoint.rpartition('.')[2]
+        if endpoint != 'static' and endpoint not in covered:
+            click.echo(f'warning: no bench case for {rule.endpoint}', err=True)
+    cases = [case for case in ROUTE_CASES if not only or case.endpoint in only]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        if database:
+            with open(database, 'rb') as src, open(path, 'wb') as dst:
+                dst.write(src.read())
+        bench_app = scratch_app(path, routes=True)
+        with bench_app.app_context():
+            if not database:
+                seed_volumes(**volumes)
+            now = datetime.now()
+            future = (now + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M')
+            bulk_insert(Event, ({'name': f'Spare {i}', 'date': now + timedelta(days=60), 'max_seats': 10 ** 6,
+                                 'seats_taken': 0} for i in range(iterations + 3)))
+            ctx = {
+                'run': int(time.time()),
+                'future': future,
+                'users': db.session.query(User).filter_by(role='student').count(),
+                'event_ids': [row[0] for row in db.session.query(Event.id).filter(
+                    ~Event.name.like('Spare %')).order_by(Event.id).limit(100)],
+                'spare_event_ids': [row[0] for row in db.session.query(Event.id).filter(
+                    Event.name.like('Spare %')).order_by(Event.id)],
+                'accounts': {
+                    'admin': [row[0] for row in db.session.query(User.id).filter_by(role='admin')],
+                    'student': [row[0] for row in db.session.query(User.id).filter_by(role='student').limit(500)],
+                },
+            }
+        try:
+            results = run_route_cases(bench_app, ctx, iterations, cases)
+        finally:
+            restore_extensions(current_app)
+
+    click.echo(f'{"route":45} {"p50":>8} {"p95":>8} {"p99":>8} {"sql":>6} {"peak":>9}')
+    for name, row in results.items():
+        click.echo(f'{name:45} {row["p50_ms"]:7.2f}ms {row["p95_ms"]:7.2f}ms {row["p99_ms"]:7.2f}ms '
+                   f'{row["statements"]:6.1f} {row["peak_kib"]:7.0f}KiB')
+
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'iterations': iterations,
+            'database': database,
+            'volumes': None if database else volumes,
+        },
+        'routes': results,
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        click.echo(f'Wrote {output}')
+    if compare_to:
+        regressions = compare_baseline(results, json.load(compare_to), tolerance)
+        if regressions:
+            raise click.ClickException(f'{len(regressions)} route(s) regressed')
+        click.echo('OK: no regressions against the baseline')
+
+
+@bench_cli.command('login')
+@click.option('--method', default=None, help='Hash method to test; defaults to PASSWORD_HASH_METHOD.')
+@click.option('--workers', default=None, help='Comma-separated hash pool sizes; 0 hashes in the request thread.')
+@click.option('--clients', default=8, show_default=True, help='Concurrent clients logging in.')
+@click.option('--logins', default=64, show_default=True, help='Logins per pool size.')
+def bench_login(method, workers, clients, logins):
+    """Login throughput with hash verification inline and in process pools of 1..N."""
+    method = method or current_app.config.get('PASSWORD_HASH_METHOD', passwords.method)
+    cpus = os.cpu_count() or 1
+    if workers:
+        pool_sizes = [int(size) for size in workers.split(',')]
+    else:
+        pool_sizes = sorted({0, 1, *(2 ** i for i in range(1, cpus.bit_length())), cpus})
+    click.echo(f'{method}, {clients} clients, {logins} logins per run, {cpus} CPUs')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = scratch_app(os.path.join(tmp, 'bench.db'), routes=True)
+        bench_app.config['PASSWORD_HASH_METHOD'] = method
+        with bench_app.app_context():
+            # Same password for every user, so hash it once
+            password = generate_password_hash('bench', method=method)
+            bulk_insert(User, ({'username': f'student{i}', 'password': password, 'role': 'student'}
+                               for i in range(clients)))
+
+        def attempt(client, username, password):
+            started = time.perf_counter()
+            response = client.post('/login', data={'username': username, 'password': password})
+            return response, time.perf_counter() - started
+
+        try:
+            for size in pool_sizes:
+                bench_app.config['PASSWORD_HASH_WORKERS'] = size
+                passwords.init_app(bench_app)
+                latencies, errors = [], []
+                lock = threading.Lock()
+
+                def worker(index):
+                    client = bench_app.test_client()
+                    attempt(client, f'student{index}', 'bench')  # warms the pool
+                    client.get('/logout')
+                    start.wait()
+                    for _ in range(index, logins, clients):
+                        response, elapsed = attempt(client, f'student{index}', 'bench')
+                        client.get('/logout')
+                        with lock:
+                            latencies.append(elapsed)
+                            if response.status_code != 302:
+                                errors.append(response.status_code)
+
+                start = threading.Event()
+                threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+                for thread in threads:
+                    thread.start()
+                time.sleep(0.5 if size == 0 else 2)
+                started = time.perf_counter()
+                start.set()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+                latencies.sort()
+                label = 'inline' if size == 0 else f'{size} process{"es" if size > 1 else ""}'
+                click.echo(f'{label:>13}: {len(latencies) / elapsed:7.1f} logins/s  '
+                           f'p50 {percentile(latencies, 50) * 1000:6.1f}ms  '
+                           f'p95 {percentile(latencies, 95) * 1000:6.1f}ms  errors {len(errors)}')
+
+            # Unknown usernames are verified against a dummy hash, so they
+            # should cost the same as a wrong password
+            bench_app.config['PASSWORD_HASH_WORKERS'] = 0
+            passwords.init_app(bench_app)
+            client = bench_app.test_client()
+            timings = {'wrong password': [], 'unknown user': []}
+            for i in range(10):
+                timings['wrong password'].append(attempt(client, 'student0', 'wrong')[1])
+                timings['unknown user'].append(attempt(client, f'nobody{i}', 'wrong')[1])
+            click.echo('Failed login p50: ' + ', '.join(
+                f'{name} {percentile(sorted(values), 50) * 1000:.1f}ms' for name, values in timings.items()))
+        finally:
+            passwords.shutdown()
+            restore_extensions(current_app)
+
+
+@bench_cli.command('identity')
+@click.option('--users', default=1000, show_default=True)
+@click.option('--lookups', default=20000, show_default=True)
+def bench_identity(users, lookups):
+    """Resolve users through load_user cold and warm; a warm lookup must run no SQL."""
+    load_user = current_app.login_manager._user_callback
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = scratch_app(os.path.join(tmp, 'bench.db'))
+        with bench_app.app_context():
+            engine = db.engine
+            password = generate_password_hash('bench', method=BENCH_HASH_METHOD)
+            bulk_insert(User, ({'username': f'student{i}', 'password': password, 'role': 'student'}
+                               for i in range(users)))
+            user_ids = [random.randint(1, users) for _ in range(lookups)]
+            for label in ('cold', 'warm'):
+                if label == 'cold':
+                    identity.cache.clear()
+                with count_statements(engine) as statements:
+                    started = time.perf_counter()
+                    for user_id in user_ids:
+                        load_user(str(user_id))
+                    elapsed = time.perf_counter() - started
+                click.echo(f'{label}: {lookups} lookups in {elapsed * 1000:.1f}ms '
+                           f'({elapsed / lookups * 1e6:.1f}us each), {len(statements)} SQL statements')
+            if statements:
+                raise click.ClickException('load_user ran SQL on a warm cache')
+
+            # Changing a user through the ORM must drop the cached identity
+            user = db.session.get(User, user_ids[0])
+            user.role = 'admin'
+            db.session.commit()
+            if load_user(str(user.id)).role != 'admin':
+                raise click.ClickException('role change was not picked up')
+    click.echo('OK: warm lookups ran no SQL and updates invalidate the cache')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def _http_client():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(), _NoRedirect())
+
+
+def _http(opener, url, data=None):
+    # Returns (status, body); redirects and HTTP errors are results, not exceptions
+    body = urllib.parse.urlencode(data).encode() if data is not None else None
+    try:
+        with opener.open(url, data=body, timeout=60) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def _wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise click.ClickException(f'server did not start on port {port}')
+
+
+@bench_cli.command('load')
+@click.option('--workers', default=None, help='Comma-separated server process counts; defaults to 1..CPUs.')
+@click.option('--clients', default=16, show_default=True, help='Concurrent HTTP clients.')
+@click.option('--duration', default=10.0, show_default=True, help='Seconds per run.')
+@click.option('--port', default=8765, show_default=True)
+@click.option('--config', 'config_object', default='config.ProductionConfig', show_default=True)
+def bench_load(workers, clients, duration, port, config_object):
+    """Throughput of dashboards and registration over HTTP with 1..N server processes."""
+    cpus = os.cpu_count() or 1
+    if workers:
+        process_counts = [int(count) for count in workers.split(',')]
+    else:
+        process_counts = sorted({1, *(2 ** i for i in range(1, cpus.bit_length())), cpus})
+    base = f'http://127.0.0.1:{port}'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        bench_app = scratch_app(path)
+        with bench_app.app_context():
+            seed_volumes(users=clients, events=200, registrations=0, notifications=clients * 10,
+                         messages=clients * 10)
+            # Registrations go to upcoming events only
+            event_ids = [row[0] for row in db.session.query(Event.id).filter(
+                Event.date > datetime.now()).order_by(Event.id)]
+        env = dict(
+            os.environ,
+            APP_CONFIG=config_object,
+            FLASK_SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}',
+            FLASK_PASSWORD_HASH_METHOD=BENCH_HASH_METHOD,
+            FLASK_LOGIN_RATE_LIMIT_ENABLED='false',
+            FLASK_SECRET_KEY='bench',
+            FLASK_EVENT_CACHE_LOCATION=os.path.join(tmp, 'event-cache'),
+        )
+        click.echo(f'{config_object}, {clients} clients, {duration:.0f}s per run, {cpus} CPUs')
+        click.echo(f'{"processes":>9} {"req/s":>8} {"dashboard p95":>14} {"register p95":>13} '
+                   f'{"registered":>10} {"errors":>7} {"locked":>7}')
+
+        for count in process_counts:
+            log_path = os.path.join(tmp, f'server-{count}.log')
+            with open(log_path, 'w') as log:
+                server = subprocess.Popen(
+                    [sys.executable, '-m', 'flask', '--app', 'app', 'serve', '--workers', str(count),
+                     '--port', str(port), '--config', config_object, '--hash-workers', '0'],
+                    cwd=current_app.root_path, env=env, stdout=log, stderr=subprocess.STDOUT
+                )
+            try:
+                _wait_for_port(port)
+                latencies = {'dashboard': [], 'register': []}
+                outcome = {'registered': 0, 'errors': 0, 'locked': 0}
+                lock = threading.Lock()
+                start = threading.Event()
+                deadline = [0.0]
+
+                def client(index):
+                    opener = _http_client()
+                    # Client 0 is the admin; the rest are students student0..
+                    admin = index == 0
+                    username = 'admin' if admin else f'student{index - 1}'
+                    _http(opener, f'{base}/login', {'username': username, 'password': 'bench'})
+                    dashboard = '/admin/dashboard' if admin else '/student/dashboard'
+                    offset = index * 7
+                    start.wait()
+                    step = 0
+                    while time.perf_counter() < deadline[0]:
+                        if admin or step % 2 == 0:
+                            kind, status_ok, started = 'dashboard', (200,), time.perf_counter()
+                            status, body = _http(opener, base + dashboard)
+                        else:
+                            event_id = event_ids[(offset + step // 2) % len(event_ids)]
+                            kind, status_ok, started = 'register', (302,), time.perf_counter()
+                            status, body = _http(opener, f'{base}/register_event/{event_id}', {})
+                        elapsed = time.perf_counter() - started
+                        step += 1
+                        with lock:
+                            latencies[kind].append(elapsed)
+                            if status not in status_ok:
+                                outcome['errors'] += 1
+                            if b'database is locked' in body:
+                                outcome['locked'] += 1
+
+                threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+                for thread in threads:
+                    thread.start()
+                time.sleep(1)
+                started = time.perf_counter()
+                deadline[0] = started + duration
+                start.set()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait(timeout=30)
+
+            with open(log_path) as log:
+                outcome['locked'] += log.read().count('database is locked')
+            with bench_app.app_context():
+                outcome['registered'] = db.session.query(Registration).count()
+                db.session.query(Registration).delete()
+                db.session.execute(db.text('UPDATE event SET seats_taken = 0'))
+                db.session.commit()
+            total = sum(len(values) for values in latencies.values())
+            p95 = {kind: percentile(sorted(values), 95) * 1000 for kind, values in latencies.items()}
+            click.echo(f'{count:>9} {total / elapsed:8.1f} {p95["dashboard"]:12.1f}ms {p95["register"]:11.1f}ms '
+                       f'{outcome["registered"]:>10} {outcome["errors"]:>7} {outcome["locked"]:>7}')
+            if outcome['locked']:
+                click.echo(f'  "database is locked" seen; server log: {log_path}', err=True)
+
+
+REPLICA_ROUTES = ('admin_dashboard', 'student_dashboard', 'view_event', 'chat')
+
+
+@bench_cli.command('replica')
+@volume_options
+def bench_replica(**volumes):
+    """Serve the read-mostly routes from a second SQLite file acting as a read replica."""
+    with tempfile.TemporaryDirectory() as tmp:
+        primary_path = os.path.join(tmp, 'primary.db')
+        replica_path = os.path.join(tmp, 'replica.db')
+        seed_app = scratch_app(primary_path)
+        with seed_app.app_context():
+            seed_volumes(**volumes)
+            db.session.remove()
+            db.engine.dispose()
+        # The stand-in replica is a point-in-time copy of the primary
+        source, target = sqlite3.connect(primary_path), sqlite3.connect(replica_path)
+        source.backup(target)
+        source.close()
+        target.close()
+
+        bench_app = scratch_app(primary_path, routes=True, SQLALCHEMY_BINDS={'replica': f'sqlite:///{replica_path}'})
+        try:
+            with bench_app.app_context():
+                primary, replica = db.engines[None], db.engines['replica']
+                # A write after the copy: only the primary has it
+                event = Event(name='After snapshot', date=datetime.now() + timedelta(days=3), max_seats=10)
+                db.session.add(event)
+                db.session.commit()
+                new_event_id = event.id
+            cases = [
+                ('admin_dashboard', '/admin/dashboard', 1),
+                ('student_dashboard', '/student/dashboard', 2),
+                ('view_event', '/event/1', 2),
+                ('view_event', f'/event/{new_event_id}', 2),
+                ('chat', '/chat', 2),
+                ('notifications', '/notifications', 2),
+            ]
+            click.echo(f'{"route":34} {"primary":>8} {"replica":>8}')
+            failures = []
+            for endpoint, path, user_id in cases:
+                client = bench_app.test_client()
+                login_as(client, user_id)
+                # Cold cache, so every route actually queries
+                event_cache.backend.clear()
+                with count_statements(primary) as on_primary, count_statements(replica) as on_replica:
+                    response = client.get(path)
+                click.echo(f'{path:34} {len(on_primary):8} {len(on_replica):8}')
+                if response.status_code != 200:
+                    failures.append(f'{path} returned {response.status_code}')
+                if endpoint in REPLICA_ROUTES and not on_replica:
+                    failures.append(f'{path} did not read from the replica')
+                if endpoint not in REPLICA_ROUTES and on_replica:
+                    failures.append(f'{path} read from the replica')
+                if any(not statement.lstrip().upper().startswith('SELECT') for statement in on_replica):
+                    failures.append(f'{path} wrote to the replica')
+        finally:
+            restore_extensions(current_app)
+    if failures:
+        raise click.ClickException('; '.join(failures))
+    click.echo('OK: replica routes read from the replica; writes and cache fills stayed on the primary')
+
+
+SEARCH_TOPICS = ('robotics', 'hackathon', 'music', 'dance', 'photography', 'debate', 'chess', 'startup',
+                 'quantum', 'poetry', 'marathon', 'blockchain', 'theatre', 'astronomy', 'cooking')
+SEARCH_KINDS = ('workshop', 'seminar', 'festival', 'meetup', 'competition', 'lecture', 'bootcamp')
+SEARCH_PLACES = ('Main hall', 'Library', 'Lab 3', 'Auditorium', 'Sports ground', 'Room 204')
+
+
+def _search_words(rng, count):
+    return [''.join(rng.choice('bcdfghklmnprstvz') + rng.choice('aeiou') for _ in range(rng.randint(2, 4)))
+            for _ in range(count)]
+
+
+@bench_cli.command('search')
+@click.option('--events', default=100000, show_default=True)
+@click.option('--repeat', default=50, show_default=True, help='Runs per query.')
+def bench_search(events, repeat):
+    """FTS5 event search vs a LIKE '%term%' scan."""
+    rng = random.Random(0)
+    vocabulary = _search_words(rng, 5000)
+    now = datetime.now()
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = scratch_app(os.path.join(tmp, 'bench.db'))
+        with bench_app.app_context():
+            started = time.perf_counter()
+            bulk_insert(Event, ({
+                'name': f'{rng.choice(SEARCH_TOPICS).title()} {rng.choice(SEARCH_KINDS)} {rng.choice(vocabulary)}',
+                'description': ' '.join(rng.choice(vocabulary) for _ in range(30)),
+                'location': rng.choice(SEARCH_PLACES),
+                'date': now + timedelta(hours=rng.randint(-24 * 365, 24 * 365)),
+                'max_seats': 100, 'registration_fee': 0.0, 'seats_taken': 0,
+            } for _ in range(events)))
+            click.echo(f'Seeded and indexed {events} events in {time.perf_counter() - started:.1f}s')
+
+            month = (now, now + timedelta(days=30))
+            queries = [
+                ('common word', 'workshop', None),
+                ('rare word', vocabulary[17], None),
+                ('prefix', 'robo', None),
+                ('two words', 'music festival', None),
+                ('word + 30 days', 'seminar', month),
+                ('no match', 'zzzzqx', None),
+            ]
+            # fts ranks the newest MAX_RANKED_MATCHES hits, fts-all ranks every hit
+            searches = (
+                ('fts', search_events),
+                ('fts-all', lambda *args: search_events(*args, max_ranked=0)),
+                ('like', lambda *args: (like_search(*args), False)),
+            )
+            click.echo(f'{"query":16} {"fts p50":>9} {"fts p95":>9} {"all p50":>9} {"all p95":>9} '
+                       f'{"like p50":>9} {"like p95":>9} {"hits":>5} truncated')
+            for label, text, dates in queries:
+                date_from, date_to = dates or (None, None)
+                row = {}
+                for name, search in searches:
+                    timings = []
+                    for _ in range(repeat):
+                        started = time.perf_counter()
+                        results, truncated = search(text, date_from, date_to)
+                        timings.append(time.perf_counter() - started)
+                    timings.sort()
+                    row[name] = (percentile(timings, 50) * 1000, percentile(timings, 95) * 1000, len(results), truncated)
+                click.echo(f'{label:16} ' + ' '.join(f'{row[name][0]:7.2f}ms {row[name][1]:7.2f}ms'
+                                                     for name, _ in searches)
+                           + f' {row["fts"][2]:5} {"yes" if row["fts"][3] else "no"}')
+
+
+def live_summary():
+    # What the analytics page would cost without rollups: every event with
+    # its registrations relationship loaded
+    rows = []
+    for event in Event.query.all():
+        registered = len(event.registrations)
+        revenue = sum(registration.payment_amount or 0.0 for registration in event.registrations)
+        rows.append((event.id, registered, revenue))
+    db.session.expire_all()
+    return rows
+
+
+def aggregate_summary():
+    # The same figures as one GROUP BY over the whole registration table
+    return db.session.execute(
+        select(Registration.event_id, func.count(Registration.id), func.sum(Registration.payment_amount))
+        .group_by(Registration.event_id)
+    ).all()
+
+
+@bench_cli.command('analytics')
+@click.option('--sizes', default='10000,100000,500000', show_default=True, help='Registration counts to try.')
+@click.option('--events', default=2000, show_default=True)
+@click.option('--repeat', default=20, show_default=True, help='Runs per rollup read.')
+@click.option('--changes', default=2000, show_default=True, help='Registrations and cancellations in the check.')
+def bench_analytics(sizes, events, repeat, changes):
+    """Analytics from the rollups vs computing them live, plus a rollup consistency check."""
+    rng = random.Random(0)
+    click.echo(f'{"registrations":>13} {"rollup p50":>11} {"rollup p95":>11} {"group by":>10} {"relations":>10}')
+    for size in [int(value) for value in sizes.split(',')]:
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_app = scratch_app(os.path.join(tmp, 'bench.db'))
+            with bench_app.app_context():
+                users = -(-size // events)
+                now = datetime.now()
+                seed_students(users)
+                bulk_insert(Event, ({'name': f'Event {i}', 'date': now + timedelta(days=i % 60 - 30),
+                                     'max_seats': users + 100, 'registration_fee': 10.0, 'seats_taken': 0}
+                                    for i in range(events)))
+                bulk_insert(Registration, ({'user_id': i // events + 1, 'event_id': i % events + 1,
+                                            'payment_amount': 10.0, 'payment_status': True, 'is_confirmed': True,
+                                            'registration_date': now - timedelta(minutes=rng.randrange(525600))}
+                                           for i in range(size)))
+                analytics.rebuild()
+
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    analytics_summary(365)
+                    timings.append(time.perf_counter() - started)
+                timings.sort()
+                started = time.perf_counter()
+                aggregate_summary()
+                grouped = time.perf_counter() - started
+                started = time.perf_counter()
+                live_summary()
+                walked = time.perf_counter() - started
+        click.echo(f'{size:13} {percentile(timings, 50) * 1000:9.2f}ms {percentile(timings, 95) * 1000:9.2f}ms '
+                   f'{grouped * 1000:8.1f}ms {walked * 1000:8.0f}ms')
+
+    # Consistency: random registrations and cancellations through the real
+    # code paths, one compaction, then the rollups must match the table
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = scratch_app(os.path.join(tmp, 'bench.db'))
+        with bench_app.app_context():
+            user_ids = seed_students(200)
+            bulk_insert(Event, ({'name': f'Event {i}', 'date': datetime.now() + timedelta(days=7),
+                                 'max_seats': 150, 'registration_fee': float(i % 4 * 5), 'seats_taken': 0}
+                                for i in range(20)))
+            event_ids = [row[0] for row in db.session.query(Event.id)]
+            registered = set()
+            for _ in range(changes):
+                user_id, event_id = rng.choice(user_ids), rng.choice(event_ids)
+                try:
+                    if (user_id, event_id) in registered:
+                        cancel_registration(user_id, event_id)
+                        registered.discard((user_id, event_id))
+                    else:
+                        reserve_seat(user_id, db.session.get(Event, event_id))
+                        registered.add((user_id, event_id))
+                except ReservationError:
+                    pass
+            pending = db.session.query(AnalyticsDelta).count()
+            started = time.perf_counter()
+            folded = analytics.compact()
+            elapsed = time.perf_counter() - started
+            expected = {event_id: (count, revenue) for event_id, count, revenue in aggregate_summary()}
+            stats = {row.event_id: (row.registered, row.revenue) for row in db.session.query(EventStats)}
+            daily = db.session.query(func.sum(DailyStats.registrations) - func.sum(DailyStats.cancellations),
+                                     func.sum(DailyStats.revenue)).one()
+    click.echo(f'compaction: folded {folded} of {pending} pending changes in {elapsed * 1000:.1f}ms')
+    mismatched = [
+        event_id for event_id in set(expected) | set(stats)
+        if stats.get(event_id, (0, 0.0))[0] != expected.get(event_id, (0, 0.0))[0]
+        or abs(stats.get(event_id, (0, 0.0))[1] - (expected.get(event_id, (0, 0.0))[1] or 0.0)) > 0.005
+    ]
+    total = sum(count for count, _ in expected.values())
+    if mismatched or folded != pending or daily[0] != total:
+        raise click.ClickException(f'Rollups disagree with the registrations: events {sorted(mismatched)[:10]}, '
+                                   f'daily net {daily[0]} vs {total}')
+    click.echo(f'OK: rollups match {total} registrations across {len(expected)} events')
+
+
+@contextmanager
+def background_writer(bench_app, event_id):
+    # Commits one small notification at a time and records how long each
+    # write took, i.e. how long it waited for the write lock
+    latencies, stop = [], threading.Event()
+
+    def write():
+        with bench_app.app_context():
+            while not stop.is_set():
+                started = time.perf_counter()
+                db.session.add(Notification(user_id=1, event_id=event_id, message='Ping'))
+                db.session.commit()
+                latencies.append(time.perf_counter() - started)
+                time.sleep(0.002)
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    try:
+        yield latencies
+    finally:
+        stop.set()
+        thread.join()
+        latencies.sort()
+
+
+def delete_in_one_transaction(event_id):
+    # The old delete_event: every row of the event in a single transaction
+    db.session.execute(Registration.__table__.delete().where(Registration.event_id == event_id))
+    db.session.execute(Notification.__table__.delete().where(Notification.event_id == event_id))
+    db.session.execute(Event.__table__.delete().where(Event.id == event_id))
+    db.session.commit()
+
+
+ARCHIVE_HOT_QUERIES = {
+    'upcoming page': lambda ctx: event_page('upcoming'),
+    'past page': lambda ctx: event_page('past'),
+    'notifications page': lambda ctx: Notification.query.filter_by(user_id=ctx['user_id']).order_by(
+        Notification.id.desc()).limit(50).all(),
+    'unread counts': lambda ctx: unread._load(ctx['user_id']),
+    'event registrations': lambda ctx: db.session.execute(
+        select(func.count(Registration.id)).where(Registration.event_id == ctx['event_id'])).scalar(),
+}
+
+
+def time_archive_queries(ctx, repeat):
+    results = {}
+    for name, query in ARCHIVE_HOT_QUERIES.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query(ctx)
+            timings.append(time.perf_counter() - started)
+            db.session.expire_all()
+        timings.sort()
+        results[name] = percentile(timings, 50) * 1000
+    return results
+
+
+def live_counts():
+    return {model.__tablename__: db.session.query(model).count() for model in (Event, Registration, Notification)}
+
+
+@bench_cli.command('archive')
+@click.option('--event-registrations', default=50000, show_default=True,
+              help='Registrations on the deleted event.')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--repeat', default=50, show_default=True, help='Runs per hot query.')
+@volume_options
+def bench_archive(event_registrations, batch_size, repeat, **volumes):
+    """Write-lock hold time of batched deletes, and hot queries before and after archival."""
+    click.echo(f'Deleting an event with {event_registrations} registrations and as many notifications '
+               'while another thread keeps writing')
+    click.echo(f'{"method":18} {"elapsed":>9} {"writes":>7} {"writer p50":>11} {"writer max":>11}')
+    for method in ('one transaction', 'batched'):
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_app = scratch_app(os.path.join(tmp, 'bench.db'))
+            with bench_app.app_context():
+                user_ids = seed_students(event_registrations)
+                now = datetime.now()
+                bulk_insert(Event, [{'name': name, 'date': now, 'max_seats': event_registrations, 'seats_taken': 0}
+                                    for name in ('Doomed', 'Other')])
+                doomed, other = [row[0] for row in db.session.query(Event.id).order_by(Event.id)]
+                bulk_insert(Registration, ({'user_id': user_id, 'event_id': doomed, 'payment_amount': 0.0,
+                                            'registration_date': now} for user_id in user_ids))
+                bulk_insert(Notification, ({'user_id': user_id, 'event_id': doomed, 'message': 'Update',
+                                            'is_read': False, 'created_at': now} for user_id in user_ids))
+                with background_writer(bench_app, other) as latencies:
+                    time.sleep(0.05)
+                    started = time.perf_counter()
+                    if method == 'batched':
+                        delete_event(doomed, batch_size)
+                    else:
+                        delete_in_one_transaction(doomed)
+                    elapsed = time.perf_counter() - started
+                    time.sleep(0.05)
+                left = (db.session.query(Registration).filter_by(event_id=doomed).count()
+                        + db.session.query(Notification).filter_by(event_id=doomed).count())
+        if left:
+            raise click.ClickException(f'{method}: {left} rows of the deleted event are left')
+        click.echo(f'{method:18} {elapsed * 1000:7.0f}ms {len(latencies):7} '
+                   f'{percentile(latencies, 50) * 1000:9.2f}ms {latencies[-1] * 1000:9.2f}ms')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = scratch_app(os.path.join(tmp, 'bench.db'))
+        with bench_app.app_context():
+            seed_volumes(**volumes)
+            cutoff = datetime.now() - timedelta(days=30)
+            ctx = {
+                'user_id': 2,
+                'event_id': db.session.query(Event.id).filter(Event.date >= datetime.now()).order_by(Event.date).first()[0],
+            }
+            before, counts_before = time_archive_queries(ctx, repeat), live_counts()
+            started = time.perf_counter()
+            events, rows = archive_events(cutoff, batch_size)
+            elapsed = time.perf_counter() - started
+            after, counts_after = time_archive_queries(ctx, repeat), live_counts()
+            archived = {model.__tablename__: db.session.query(model).count()
+                        for model in (ArchivedEvent, ArchivedRegistration, ArchivedNotification)}
+
+    click.echo(f'Archived events older than 30 days: {events} events and {rows} rows in {elapsed:.1f}s '
+               f'({(rows + events) / elapsed:.0f} rows/s)')
+    for name, count in counts_before.items():
+        click.echo(f'{name:13} live {count:7} -> {counts_after[name]:7}   archived {archived["archived_" + name]:7}')
+        if counts_after[name] + archived['archived_' + name] != count:
+            raise click.ClickException(f'{name}: rows were lost or duplicated')
+    click.echo(f'{"query":22} {"before":>9} {"after":>9}')
+    for name in ARCHIVE_HOT_QUERIES:
+        click.echo(f'{name:22} {before[name]:7.2f}ms {after[name]:7.2f}ms')
+
+    # The same cut into a compressed file, from a fresh copy of the data
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = scratch_app(os.path.join(tmp, 'bench.db'))
+        path = os.path.join(tmp, 'archive.jsonl.gz')
+        with bench_app.app_context():
+            seed_volumes(**volumes)
+            archive = FileArchive(path)
+            try:
+                started = time.perf_counter()
+                file_events, file_rows = archive_events(datetime.now() - timedelta(days=30), batch_size, archive)
+                elapsed = time.perf_counter() - started
+            finally:
+                archive.close()
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            lines = sum(1 for _ in f)
+        size = os.path.getsize(path)
+    click.echo(f'To a gzip file: {file_events} events and {file_rows} rows in {elapsed:.1f}s, {size / 1024:.0f}KiB')
+    if lines != file_events + file_rows:
+        raise click.ClickException(f'{lines} lines written for {file_events + file_rows} rows')
+    click.echo('OK: every archived row is in exactly one place')
+
+
+
+
+@bench_cli.command('dashboard-render')
+@click.option('--events', default=500, show_default=True)
+@click.option('--requests', 'request_count', default=300, show_default=True, help='Requests per measurement.')
+def bench_dashboard_render(events, request_count):
+    """Dashboard CPU with and without cached event cards, bytes per encoding, and 304 revalidation."""
+    encodings = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+    decoders = {'identity': lambda body: body, 'gzip': gzip.decompress,
+                'br': brotli.decompress if brotli is not None else None}
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = scratch_app(os.path.join(tmp, 'bench.db'), routes=True)
+        try:
+            with bench_app.app_context():
+                user_ids = seed_students(51)
+                seed_events(events, 50, user_ids[:50])
+                admin = User(username='admin', password='-', role='admin')
+                db.session.add(admin)
+                db.session.commit()
+                accounts = {'admin': admin.id, 'student': user_ids[0]}
+
+            def cpu_ms(client, path, headers, status=200):
+                # CPU per request, so the single core's other work does not count
+                started = time.process_time()
+                for _ in range(request_count):
+                    if client.get(path, headers=headers).status_code != status:
+                        raise click.ClickException(f'{path} did not return {status}')
+                return (time.process_time() - started) / request_count * 1000
+
+            original = fragment_cache.backend
+            etags = {}
+            for role, path in (('admin', '/admin/dashboard'), ('student', '/student/dashboard')):
+                client = bench_app.test_client()
+                login_as(client, accounts[role])
+                pages, cpu = {}, {}
+                try:
+                    for label, backend in (('off', 'null'), ('on', 'memory')):
+                        fragment_cache.backend = make_cache(backend, ttl=3600, maxsize=8192)
+                        # The first request fills the caches
+                        pages[label] = client.get(path).get_data()
+                        cpu[label] = cpu_ms(client, path, {'Accept-Encoding': 'identity'})
+                finally:
+                    fragment_cache.backend = original
+                if pages['off'] != pages['on']:
+                    raise click.ClickException(f'{path} differs with cached cards')
+                click.echo(f'{path:19} cards uncached cpu={cpu["off"]:.2f}ms  cached cpu={cpu["on"]:.2f}ms '
+                           f'({1 - cpu["on"] / cpu["off"]:.0%} less)')
+
+                for encoding in encodings:
+                    headers = {'Accept-Encoding': encoding}
+                    response = client.get(path, headers=headers)
+                    body = response.get_data()
+                    if (response.headers.get('Content-Encoding', 'identity') != encoding
+                            or decoders[encoding](body) != pages['on']):
+                        raise click.ClickException(f'{path} with {encoding} did not round-trip')
+                    click.echo(f'{path:19} {encoding:8} bytes={len(body):6} ({len(body) / len(pages["on"]):4.0%})  '
+                               f'cpu={cpu_ms(client, path, headers):.2f}ms')
+
+                etags[role] = client.get(path).headers['ETag']
+                revalidated = client.get(path, headers={'If-None-Match': etags[role]})
+                if revalidated.status_code != 304 or revalidated.get_data():
+                    raise click.ClickException(f'{path} did not revalidate: {revalidated.status_code}')
+                click.echo(f'{path:19} 304      bytes=     0          '
+                           f'cpu={cpu_ms(client, path, {"If-None-Match": etags[role]}, status=304):.2f}ms')
+
+            # A registration changes one card's seat count: the page has to be re-sent
+            with bench_app.app_context():
+                rows, _ = event_cache.event_page('upcoming', limit=1)
+                reserve_seat(user_ids[50], db.session.get(Event, rows[0][0]['id']))
+                event_cache.invalidate_listings()
+            client = bench_app.test_client()
+            login_as(client, accounts['student'])
+            changed = client.get('/student/dashboard', headers={'If-None-Match': etags['student']})
+            if changed.status_code != 200 or changed.headers['ETag'] == etags['student']:
+                raise click.ClickException(f'A changed dashboard returned {changed.status_code}')
+            click.echo('OK: cached cards match fresh renders, encodings round-trip, changes update the ETag')
+        finally:
+            restore_extensions(current_app)
@@ -0,0 +1,211 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select
+
+from models import db, User, Event, Registration
+from event_cache import event_cache
+from search import rebuild_index
+from analytics import analytics
+from archive import archive_events, TableArchive, FileArchive, DEFAULT_ARCHIVE_AFTER_DAYS, DEFAULT_BATCH_SIZE
+
+DEFAULT_CHUNK_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = (
+    'registration_id', 'event_id', 'event_name', 'event_date', 'user_id', 'username',
+    'payment_amount', 'payment_status', 'is_confirmed', 'registration_date',
+)
+
+data_cli = AppGroup('data', help='Bulk import and export.')
+
+
+class BulkImportError(ValueError):
+    pass
+
+
+def parse_event_row(row, line):
+    try:
+        date = row['date']
+        if not isinstance(date, datetime):
+            date = datetime.fromisoformat(str(date).strip())
+        name = (row.get('name') or '').strip()
+        if not name:
+            raise ValueError('name is required')
+        return {
+            'name': name,
+            'description': row.get('description') or '',
+            'date': date,
+            'location': row.get('location') or '',
+            'max_seats': int(row.get('max_seats') or 100),
+            'registration_fee': float(row.get('registration_fee') or 0.0),
+            'seats_taken': 0,
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise BulkImportError(f'Row {line}: {e}')
+
+
+def read_event_rows(stream, fmt):
+    # Yields (line, row) without reading the whole file. 'json' accepts JSON
+    # Lines; a single JSON array is supported too but is parsed in one go.
+    if fmt == 'csv':
+        for line, row in enumerate(csv.DictReader(stream), start=2):
+            yield line, row
+    elif fmt == 'json':
+        first = stream.read(1)
+        while first.isspace():
+            first = stream.read(1)
+        if first == '[':
+            for line, row in enumerate(json.loads(first + stream.read()), start=1):
+                yield line, row
+            return
+        for line, text in enumerate(_prepend(first, stream), start=1):
+            if text.strip():
+                yield line, json.loads(text)
+    else:
+        raise BulkImportError(f'Unknown format: {fmt!r}')
+
+
+def _prepend(first, stream):
+    lines = iter(stream)
+    yield first + next(lines, '')
+    yield from lines
+
+
+def import_events(stream, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE):
+    # One transaction per chunk keeps write locks short; on a bad row the
+    # earlier chunks stay committed and the error names the offending row.
+    imported = 0
+    chunk = []
+    try:
+        for line, row in read_event_rows(stream, fmt):
+            chunk.append(parse_event_row(row, line))
+            if len(chunk) == chunk_size:
+                db.session.execute(Event.__table__.insert(), chunk)
+                db.session.commit()
+                imported += len(chunk)
+                chunk = []
+        if chunk:
+            db.session.execute(Event.__table__.insert(), chunk)
+            db.session.commit()
+            imported += len(chunk)
+    except json.JSONDecodeError as e:
+        raise BulkImportError(f'Invalid JSON ({imported} events imported before it): {e}')
+    except BulkImportError as e:
+        raise BulkImportError(f'{e} ({imported} events imported before it)')
+    finally:
+        if imported:
+            event_cache.invalidate_listings()
+    return imported
+
+
+def registration_rows(event_id=None):
+    statement = (
+        select(
+            Registration.id, Event.id, Event.name, Event.date, User.id, User.username,
+            Registration.payment_amount, Registration.payment_status, Registration.is_confirmed,
+            Registration.registration_date
+        )
+        .join(User, User.id == Registration.user_id)
+        .join(Event, Event.id == Registration.event_id)
+        .order_by(Registration.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    if event_id is not None:
+        statement = statement.where(Registration.event_id == event_id)
+    # yield_per streams from the cursor in batches instead of buffering the result
+    for row in db.session.execute(statement):
+        yield dict(zip(EXPORT_COLUMNS, row))
+
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_registrations(event_id=None, fmt='csv'):
+    # Generator of text chunks, roughly one per EXPORT_BATCH_SIZE rows
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        write = writer.writerow
+    elif fmt == 'jsonl':
+        def write(row):
+            buffer.write(json.dumps({key: _jsonable(value) for key, value in row.items()}) + '\n')
+    else:
+        raise BulkImportError(f'Unknown format: {fmt!r}')
+
+    for count, row in enumerate(registration_rows(event_id), start=1):
+        write(row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+@data_cli.command('import-events')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), default=None,
+              help='Defaults to the file extension.')
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True)
+def import_events_command(source, fmt, chunk_size):
+    """Import events from a CSV or JSON (Lines) file."""
+    fmt = fmt or ('csv' if source.name.endswith('.csv') else 'json')
+    try:
+        imported = import_events(source, fmt, chunk_size)
+    except BulkImportError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Imported {imported} events')
+
+
+@data_cli.command('export-registrations')
+@click.option('--event-id', type=int, default=None, help='Only this event.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default='csv', show_default=True)
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='Defaults to stdout.')
+def export_registrations_command(event_id, fmt, output):
+    """Stream registrations joined with users and events."""
+    for chunk in export_registrations(event_id, fmt):
+        output.write(chunk)
+    if output.name != '<stdout>':
+        click.echo(f'Wrote {output.name}', err=True)
+
+
+@data_cli.command('rebuild-search')
+def rebuild_search_command():
+    """Rebuild the event search index from the event table (SQLite only)."""
+    rebuild_index()
+    click.echo('Rebuilt the event search index')
+
+
+@data_cli.command('compact-analytics')
+def compact_analytics_command():
+    """Fold pending registration changes into the analytics rollups now."""
+    click.echo(f'Folded {analytics.compact()} changes into the analytics rollups')
+
+
+@data_cli.command('rebuild-analytics')
+def rebuild_analytics_command():
+    """Recompute the analytics rollups from the registration table."""
+    analytics.rebuild()
+    click.echo('Rebuilt the analytics rollups')
+
+
+@data_cli.command('archive-events')
+@click.option('--older-than', 'days', default=DEFAULT_ARCHIVE_AFTER_DAYS, show_default=True,
+              help='Archive events dated more than this many days ago.')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, help='Rows moved per transaction.')
+@click.option('--to-file', type=click.Path(dir_okay=False), default=None,
+              help='Append to this gzip JSON Lines file instead of the archived_* tables.')
+def archive_events_command(days, batch_size, to_file):
+    """Move past events and their registrations and notifications out of the live tables."""
+    archive = FileArchive(to_file) if to_file else TableArchive()
+    try:
+        events, rows = archive_events(datetime.now() - timedelta(days=days), batch_size, archive)
+    finally:
+        archive.close()
+    click.echo(f'Archived {events} events with {rows} registration and notification rows')
+
@@ -0,0 +1,261 @@
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class BaseCache:
+    # Backends implement _get/set/delete/clear; get() keeps hit/miss counts
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        value = self._get(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def peek(self, key, default=None):
+        # Like get() but left out of the hit/miss counts, for bookkeeping keys
+        value = self._get(key)
+        return default if value is _MISSING else value
+
+    def _get(self, key):
+        return _MISSING
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class NullCache(BaseCache):
+    # Always misses; used to switch caching off
+    pass
+
+
+class TTLCache(BaseCache):
+    # Thread-safe LRU with a per-entry time-to-live. Process-local: every
+    # worker keeps its own copy, so writers invalidate and the TTL bounds
+    # how stale another worker's copy can get.
+
+    def __init__(self, maxsize=1024, ttl=60):
+        super().__init__(ttl)
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._data[key]
+            return _MISSING
+        return value
+
+    def _get(self, key):
+        with self._lock:
+            value = self._live(key, time.monotonic())
+            if value is not _MISSING:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def adjust(self, key, func):
+        # Replace a live entry with func(value) atomically; absent entries stay absent
+        with self._lock:
+            value = self._live(key, time.monotonic())
+            if value is _MISSING:
+                return False
+            expires_at = self._data[key][0]
+            self._data[key] = (expires_at, func(value))
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FileCache(BaseCache):
+    # One pickle per key in a local directory, shared by every worker on the
+    # host. Entries are unpickled, so the directory must be private: it is
+    # created 0700 and refused if another user owns it or can write to it.
+    # Each file's mtime is its expiry time, so a sweep every sweep_interval
+    # seconds (run by whichever writer comes first) removes expired entries
+    # from a directory listing alone, then the soonest to expire while more
+    # than maxsize remain.
+
+    def __init__(self, directory, ttl=60, maxsize=4096, sweep_interval=60):
+        super().__init__(ttl)
+        self.directory = directory
+        self.maxsize = maxsize
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        check_private_directory(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(str(key).encode()).hexdigest())
+
+    def _get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return _MISSING
+        if expires_at <= time.time():
+            self.delete(key)
+            return _MISSING
+        return value
+
+    def set(self, key, value, ttl=None):
+        # Write then rename so readers never see a partial file
+        expires_at = time.time() + (ttl or self.ttl)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((expires_at, value), f)
+        os.utime(tmp_path, (expires_at, expires_at))
+        os.replace(tmp_path, self._path(key))
+        self._maybe_sweep()
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + self.sweep_interval
+        self.sweep()
+
+    def sweep(self):
+        # Returns how many entries were removed
+        now = time.time()
+        live = []
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    expires_at = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if entry.name.startswith('.tmp'):
+                    # Left by a writer that died mid-write; in-flight ones are newer
+                    if expires_at < now - 3600:
+                        removed += self._remove(entry.path)
+                elif expires_at <= now:
+                    removed += self._remove(entry.path)
+                else:
+                    live.append((expires_at, entry.path))
+        if len(live) > self.maxsize:
+            live.sort()
+            for _, path in live[:len(live) - self.maxsize]:
+                removed += self._remove(path)
+        return removed
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        return 1
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            self._remove(os.path.join(self.directory, name))
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if not name.startswith('.tmp'))
+
+
+def check_private_directory(directory):
+    # Anyone who can write here can make this process unpickle their file
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise RuntimeError(f'Cache directory {directory} is not a directory')
+    if hasattr(os, 'getuid') and (info.st_uid != os.getuid() or info.st_mode & 0o077):
+        raise RuntimeError(f'Cache directory {directory} must be owned by this user with mode 0700')
+
+
+class RedisCache(BaseCache):
+    # Any Redis-protocol server; needs the optional redis package
+
+    def __init__(self, url, ttl=60, prefix='cem:'):
+        super().__init__(ttl)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('RedisCache needs the redis package (pip install redis)')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _get(self, key):
+        raw = self.client.get(self.prefix + str(key))
+        return _MISSING if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + str(key), pickle.dumps(value), ex=int(ttl or self.ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + str(key))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+def make_cache(backend='memory', ttl=60, maxsize=1024, location=None):
+    if backend == 'memory':
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    if backend == 'file':
+        if not location:
+            # No shared temp directory default: see FileCache
+            raise ValueError('The file cache backend needs a location')
+        return FileCache(location, ttl=ttl, maxsize=maxsize)
+    if backend == 'redis':
+        return RedisCache(location or 'redis://localhost:6379/0', ttl=ttl)
+    if backend in ('null', 'none', None):
+        return NullCache(ttl)
+    raise ValueError(f'Unknown cache backend: {backend!r}')
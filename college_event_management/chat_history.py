@@ -0,0 +1,82 @@
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.orm import joinedload
+from models import db, User, ChatMessage
+from counters import unread
+
+DEFAULT_HISTORY_SIZE = 50
+MAX_HISTORY_SIZE = 200
+
+
+def conversation_filter(user_id, peer_id=None):
+    if peer_id is None:
+        return or_(ChatMessage.sender_id == user_id, ChatMessage.receiver_id == user_id)
+    return or_(
+        and_(ChatMessage.sender_id == user_id, ChatMessage.receiver_id == peer_id),
+        and_(ChatMessage.sender_id == peer_id, ChatMessage.receiver_id == user_id)
+    )
+
+
+def chat_history(user_id, peer_id=None, before_id=None, limit=DEFAULT_HISTORY_SIZE):
+    # Newest `limit` messages older than before_id, returned oldest first.
+    # Returns (messages, next_before_id); next_before_id is None on the last page.
+    limit = max(1, min(limit, MAX_HISTORY_SIZE))
+    query = ChatMessage.query.options(joinedload(ChatMessage.sender)).filter(conversation_filter(user_id, peer_id))
+    if before_id is not None:
+        query = query.filter(ChatMessage.id < before_id)
+    messages = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+    next_before_id = messages[limit - 1].id if len(messages) > limit else None
+    return messages[:limit][::-1], next_before_id
+
+
+def conversation_index(admin_id):
+    # One row per student the admin has talked to: (student, last_message, unread),
+    # newest conversation first, computed in a single grouped query.
+    peer = case((ChatMessage.sender_id == admin_id, ChatMessage.receiver_id), else_=ChatMessage.sender_id)
+    unread = func.sum(case((and_(ChatMessage.receiver_id == admin_id, ChatMessage.is_read == False), 1), else_=0))
+    grouped = (
+        db.session.query(
+            peer.label('peer_id'),
+            func.max(ChatMessage.id).label('last_id'),
+            unread.label('unread')
+        )
+        .filter(conversation_filter(admin_id))
+        .group_by(peer)
+        .subquery()
+    )
+    return (
+        db.session.query(User, ChatMessage, grouped.c.unread)
+        .join(grouped, grouped.c.peer_id == User.id)
+        .join(ChatMessage, ChatMessage.id == grouped.c.last_id)
+        .order_by(grouped.c.last_id.desc())
+        .all()
+    )
+
+
+def latest_message(user_id):
+    # (id, peer_id) of the newest message in any of the user's conversations,
+    # or None. Plain columns, so a later commit cannot expire them.
+    row = db.session.execute(
+        select(ChatMessage.id, ChatMessage.sender_id, ChatMessage.receiver_id)
+        .where(conversation_filter(user_id))
+        .order_by(ChatMessage.id.desc())
+        .limit(1)
+    ).first()
+    if row is None:
+        return None
+    return row.id, row.receiver_id if row.sender_id == user_id else row.sender_id
+
+
+def mark_conversation_read(reader_id, peer_id=None):
+    criteria = [ChatMessage.receiver_id == reader_id, ChatMessage.is_read == False]
+    if peer_id is not None:
+        criteria.append(ChatMessage.sender_id == peer_id)
+    result = db.session.execute(
+        update(ChatMessage).where(*criteria).values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if peer_id is None:
+        unread.reset(reader_id, 'messages')
+    else:
+        unread.incr(reader_id, 'messages', -result.rowcount)
+    return result.rowcount
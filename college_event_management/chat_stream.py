@@ -0,0 +1,208 @@
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from models import db, ChatMessage
+
+KEEPALIVE_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 256
+# Most missed messages a (re)connecting stream replays; past that the client
+# reloads and pages back through /api/chat/messages
+STREAM_BACKLOG_SIZE = 200
+# How long a browser turned away by CHAT_MAX_STREAMS waits before reconnecting
+STREAM_RETRY_MS = 30000
+# Messages the cross-worker poller reads per query
+POLL_BATCH_SIZE = 500
+
+
+class Subscription:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+
+class MessageBroker:
+    # In-process fan-out of new chat messages to open streams. Each worker
+    # process has its own broker and publishes what it saves itself; messages
+    # saved by other workers come from one poller thread per process, which
+    # every CHAT_POLL_INTERVAL seconds (0 disables it) reads the messages
+    # past the newest id it has seen, over the primary key, and then delivers
+    # every message, local ones included, in id order. It runs only while
+    # streams are open.
+    # On PostgreSQL a message committed after a larger id was polled is
+    # skipped; the client sees it on its next reload.
+
+    def __init__(self, app=None, poll_interval=0):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self.poll_interval = poll_interval
+        self._poller = None
+        self._polled_id = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('CHAT_POLL_INTERVAL', self.poll_interval)
+        app.extensions['chat_broker'] = self
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+            self._start_poller()
+        return subscription
+
+    def _start_poller(self):
+        # Under the lock, from the request opening a stream and before it reads
+        # its backlog, so any message the backlog misses is past _polled_id
+        if not self.poll_interval or self._poller is not None:
+            return
+        try:
+            self._polled_id = db.session.query(func.coalesce(func.max(ChatMessage.id), 0)).scalar()
+        except Exception:
+            # The next stream to open tries again
+            self.app.logger.exception('Chat poller failed to start')
+            return
+        self._poller = threading.Thread(target=self._poll, name='chat-poller', daemon=True)
+        self._poller.start()
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    return
+            with self.app.app_context():
+                try:
+                    while True:
+                        messages = messages_since(self._polled_id)
+                        for message in messages:
+                            self._polled_id = message['id']
+                            self.publish(message)
+                        if len(messages) < POLL_BATCH_SIZE:
+                            break
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Chat poll failed')
+                finally:
+                    db.session.remove()
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def saved(self, message):
+        # A message this process just saved. With polling on it goes out with
+        # the next poll instead: streams skip ids at or below the last one they
+        # sent, so delivering it now would drop older messages from other workers
+        if not self.poll_interval:
+            self.publish(message)
+
+    def publish(self, message):
+        with self._lock:
+            targets = set(self._subscribers.get(message['sender_id'], ()))
+            targets |= self._subscribers.get(message['receiver_id'], set())
+        for subscription in targets:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                # A stalled client: end its stream, it resumes from its last id
+                subscription.closed = True
+
+
+broker = MessageBroker()
+
+
+def serialize_message(message):
+    return {
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'receiver_id': message.receiver_id,
+        'sender': message.sender.username if message.sender else None,
+        'content': message.content,
+        'timestamp': message.timestamp.strftime('%Y-%m-%d %H:%M'),
+    }
+
+
+def messages_after(user_id, last_id, limit=STREAM_BACKLOG_SIZE):
+    # Up to `limit` messages after last_id, oldest first; None when more than
+    # that were missed
+    messages = ChatMessage.query.options(joinedload(ChatMessage.sender)).filter(
+        ((ChatMessage.sender_id == user_id) | (ChatMessage.receiver_id == user_id)),
+        ChatMessage.id > last_id
+    ).order_by(ChatMessage.id.asc()).limit(limit + 1).all()
+    if len(messages) > limit:
+        return None
+    return [serialize_message(message) for message in messages]
+
+
+def messages_since(last_id, limit=POLL_BATCH_SIZE):
+    # Everyone's messages after last_id, oldest first, for the poller
+    messages = ChatMessage.query.options(joinedload(ChatMessage.sender)).filter(
+        ChatMessage.id > last_id
+    ).order_by(ChatMessage.id.asc()).limit(limit).all()
+    return [serialize_message(message) for message in messages]
+
+
+def format_event(message):
+    return f"id: {message['id']}\ndata: {json.dumps(message)}\n\n"
+
+
+def event_stream(subscription, backlog, last_id):
+    try:
+        # Servers such as waitress send the headers with the first chunk;
+        # without this a quiet stream would look stalled until a keepalive
+        yield ': connected\n\n'
+        if backlog is None:
+            # Too far behind to replay: tell the client to start over
+            yield 'event: reset\ndata: {}\n\n'
+            return
+        for message in backlog:
+            last_id = message['id']
+            yield format_event(message)
+        while not subscription.closed:
+            try:
+                message = subscription.get(timeout=KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            # Messages published while the backlog was loading arrive twice
+            if message['id'] <= last_id:
+                continue
+            last_id = message['id']
+            yield format_event(message)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def open_stream(user_id, last_id=None):
+    # Subscribe before reading the backlog so nothing is missed in between,
+    # then hand the connection back to the pool for the life of the stream.
+    # Returns (subscription, stream); unsubscribe also runs if the stream is
+    # closed before it is ever iterated.
+    subscription = broker.subscribe(user_id)
+    try:
+        backlog = messages_after(user_id, last_id) if last_id is not None else []
+    except Exception:
+        broker.unsubscribe(subscription)
+        raise
+    db.session.close()
+    return subscription, event_stream(subscription, backlog, last_id or 0)
@@ -0,0 +1,71 @@
+import os
+
+
+def database_url(url):
+    # Hosting providers still hand out postgres://, which SQLAlchemy 1.4+ rejects
+    if url and url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
+    # Any SQLAlchemy URL; PostgreSQL needs a driver such as psycopg2-binary
+    SQLALCHEMY_DATABASE_URI = database_url(os.environ.get('DATABASE_URL', 'sqlite:///site.db'))
+    # Optional read-only copy for the @read_replica views (see replica.py)
+    SQLALCHEMY_BINDS = (
+        {'replica': database_url(os.environ['DATABASE_REPLICA_URL'])}
+        if os.environ.get('DATABASE_REPLICA_URL') else {}
+    )
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connections held per process; size it to the server's threads per process
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+    }
+    # Applied to every new SQLite connection; other backends ignore them. WAL
+    # lets readers run alongside the single writer; busy_timeout makes writers
+    # wait for the lock instead of failing with "database is locked";
+    # foreign_keys enforces the schema's ON DELETE CASCADE.
+    SQLITE_PRAGMAS = {
+        'foreign_keys': 'ON',
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+    }
+    METRICS_ENABLED = False
+    # Reverse proxies in front of the app (e.g. FLASK_PROXY_COUNT=1 behind
+    # nginx); 0 trusts no X-Forwarded-* headers
+    PROXY_COUNT = 0
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class ProductionConfig(Config):
+    # No fallback: create_app() refuses to start without a real key
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    # Several worker processes: an admin edit must reach all of them at once,
+    # so the event cache is shared through files, in instance/event-cache
+    # unless FLASK_EVENT_CACHE_LOCATION names another private directory (use
+    # redis when workers span hosts)
+    EVENT_CACHE_BACKEND = 'file'
+    # Chat streams get messages saved by other workers within this many seconds
+    CHAT_POLL_INTERVAL = 1
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 20,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_pre_ping': True,
+    }
+    SQLITE_PRAGMAS = {
+        **Config.SQLITE_PRAGMAS,
+        'busy_timeout': 15000,
+        'cache_size': -64000,
+    }
+    # Hash processes per worker process: servers run about one worker per
+    # core, so more would oversubscribe the CPU (flask serve sizes it itself)
+    PASSWORD_HASH_WORKERS = 1
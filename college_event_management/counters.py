@@ -0,0 +1,58 @@
+from sqlalchemy import func, select, update
+from cache import TTLCache
+from models import db, Notification, ChatMessage
+
+COUNTER_KINDS = ('notifications', 'messages')
+
+
+class UnreadCounters:
+    # Per-user unread notification/message counts. A miss costs one query;
+    # writers adjust cached counts in place so hits stay exact in this process.
+
+    def __init__(self, maxsize=10000, ttl=30):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, user_id):
+        counts = self.cache.get(user_id)
+        if counts is None:
+            counts = self._load(user_id)
+            self.cache.set(user_id, counts)
+        return dict(counts)
+
+    def _load(self, user_id):
+        notifications = (
+            select(func.count(Notification.id))
+            .where(Notification.user_id == user_id, Notification.is_read == False)
+            .scalar_subquery()
+        )
+        messages = (
+            select(func.count(ChatMessage.id))
+            .where(ChatMessage.receiver_id == user_id, ChatMessage.is_read == False)
+            .scalar_subquery()
+        )
+        row = db.session.execute(select(notifications, messages)).one()
+        return dict(zip(COUNTER_KINDS, row))
+
+    def incr(self, user_id, kind, amount=1):
+        self.cache.adjust(user_id, lambda counts: {**counts, kind: max(counts[kind] + amount, 0)})
+
+    def reset(self, user_id, kind):
+        self.cache.adjust(user_id, lambda counts: {**counts, kind: 0})
+
+    def invalidate(self, user_id):
+        self.cache.delete(user_id)
+
+
+unread = UnreadCounters()
+
+
+def mark_all_notifications_read(user_id):
+    result = db.session.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read == False)
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    unread.reset(user_id, 'notifications')
+    return result.rowcount
@@ -0,0 +1,29 @@
+from sqlalchemy import event
+
+from models import db
+from replica import REPLICA_BIND
+
+
+def init_database(app):
+    db.init_app(app)
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            if engine.dialect.name != 'sqlite':
+                continue
+            if bind_key == REPLICA_BIND:
+                # Fail loudly if a write is ever routed to the replica
+                event.listen(engine, 'connect', sqlite_pragma_listener({**pragmas, 'query_only': 'ON'}))
+            else:
+                event.listen(engine, 'connect', sqlite_pragma_listener(pragmas))
+
+
+def sqlite_pragma_listener(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return set_pragmas
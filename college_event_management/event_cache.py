@@ -0,0 +1,82 @@
+import os
+
+from cache import make_cache
+from models import db, Event
+from queries import event_page, DEFAULT_PAGE_SIZE
+from replica import use_primary
+
+EVENT_FIELDS = ('id', 'name', 'description', 'date', 'location', 'max_seats', 'registration_fee')
+
+
+def event_snapshot(event):
+    # Plain dict so every backend can store it; templates read it like the model
+    return {field: getattr(event, field) for field in EVENT_FIELDS}
+
+
+class EventCache:
+    # Read-through cache for event detail and listing pages. Event rows change
+    # only through the admin routes, which call invalidate_event(). Listing
+    # pages also carry seat counts, so they get a shorter TTL of their own.
+    # The memory backend is per process; use the file or redis backend when
+    # several workers must see an invalidation immediately.
+
+    def __init__(self, app=None):
+        self.backend = make_cache('null')
+        self.listing_ttl = 5
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('EVENT_CACHE_BACKEND', 'memory')
+        location = app.config.get('EVENT_CACHE_LOCATION')
+        if backend == 'file' and not location:
+            # Inside the app's instance folder rather than a shared temp directory
+            location = os.path.join(app.instance_path, 'event-cache')
+        self.backend = make_cache(
+            backend,
+            ttl=app.config.get('EVENT_CACHE_TTL', 300),
+            maxsize=app.config.get('EVENT_CACHE_MAXSIZE', 4096),
+            location=location
+        )
+        self.listing_ttl = app.config.get('EVENT_CACHE_LISTING_TTL', self.listing_ttl)
+        app.extensions['event_cache'] = self
+
+    def get_event(self, event_id):
+        key = f'event:{event_id}'
+        snapshot = self.backend.get(key)
+        if snapshot is None:
+            # Fill from the primary: a lagging replica would pin stale rows for the TTL
+            with use_primary():
+                event = db.session.get(Event, event_id)
+            if event is None:
+                return None
+            snapshot = event_snapshot(event)
+            self.backend.set(key, snapshot)
+        return snapshot
+
+    def _generation(self):
+        return self.backend.peek('events:generation', 0)
+
+    def event_page(self, scope='upcoming', cursor=None, limit=DEFAULT_PAGE_SIZE):
+        # Keyed by a generation number so one write drops every cached page
+        key = f'events:{self._generation()}:{scope}:{cursor}:{limit}'
+        page = self.backend.get(key)
+        if page is None:
+            # Listings may come from a replica: their short TTL bounds the staleness
+            rows, next_cursor = event_page(scope, cursor, limit)
+            page = ([(event_snapshot(event), registered) for event, registered in rows], next_cursor)
+            self.backend.set(key, page, ttl=self.listing_ttl)
+        return page
+
+    def invalidate_event(self, event_id):
+        self.backend.delete(f'event:{event_id}')
+        self.invalidate_listings()
+
+    def invalidate_listings(self):
+        self.backend.set('events:generation', self._generation() + 1, ttl=86400)
+
+    def stats(self):
+        return self.backend.stats()
+
+
+event_cache = EventCache()
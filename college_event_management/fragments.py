@@ -0,0 +1,74 @@
+import hashlib
+import os
+
+from flask import current_app
+from markupsafe import Markup
+
+from cache import make_cache
+from event_cache import EVENT_FIELDS
+
+
+def card_version(event, registered):
+    # Changes with anything the card shows: an edit to the event or a new seat
+    # count. A real hash rather than hash(), which differs between processes,
+    # so workers sharing a file or redis backend agree on the key.
+    values = repr(tuple(event[field] for field in EVENT_FIELDS) + (registered,))
+    return hashlib.blake2b(values.encode(), digest_size=8).hexdigest()
+
+
+class FragmentCache:
+    # Rendered HTML of the per-event cards on the dashboards, keyed by template,
+    # a hash of its source, event id and card_version(). Nothing needs
+    # invalidating: a changed event or an edited template gets a new key and
+    # the old entry ages out. Templates call
+    # {{ cached_card('_admin_event_card.html', event, registered_count) }}.
+
+    def __init__(self, app=None):
+        self.backend = make_cache('null')
+        # template name -> (compiled template, source hash)
+        self.template_versions = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('FRAGMENT_CACHE_BACKEND', 'memory')
+        location = app.config.get('FRAGMENT_CACHE_LOCATION')
+        if backend == 'file' and not location:
+            # Next to the event cache's default directory
+            location = os.path.join(app.instance_path, 'fragment-cache')
+        self.backend = make_cache(
+            backend,
+            ttl=app.config.get('FRAGMENT_CACHE_TTL', 3600),
+            maxsize=app.config.get('FRAGMENT_CACHE_MAXSIZE', 8192),
+            location=location
+        )
+        app.jinja_env.globals['cached_card'] = self.card
+        app.extensions['fragment_cache'] = self
+
+    def template_version(self, env, template):
+        # Hashed once per compiled template: Jinja hands back a new object when
+        # it reloads a changed file, which is when the hash is recomputed
+        compiled = env.get_template(template)
+        cached = self.template_versions.get(template)
+        if cached is None or cached[0] is not compiled:
+            source = env.loader.get_source(env, template)[0]
+            cached = (compiled, hashlib.blake2b(source.encode(), digest_size=8).hexdigest())
+            self.template_versions[template] = cached
+        return compiled, cached[1]
+
+    def card(self, template, event, registered):
+        compiled, version = self.template_version(current_app.jinja_env, template)
+        key = f'card:{template}:{version}:{event["id"]}:{card_version(event, registered)}'
+        html = self.backend.get(key)
+        if html is None:
+            # Straight through Jinja: the card needs no request context
+            # processors, and render signals would count it twice in metrics
+            html = compiled.render(event=event, registered_count=registered)
+            self.backend.set(key, html)
+        return Markup(html)
+
+    def stats(self):
+        return self.backend.stats()
+
+
+fragment_cache = FragmentCache()
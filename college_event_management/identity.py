@@ -0,0 +1,53 @@
+from flask_login import UserMixin
+from sqlalchemy import event, select
+
+from cache import TTLCache
+from models import db, User
+
+
+class CachedUser(UserMixin):
+    # Stand-in for current_user built from the cache: carries only what views
+    # and templates read (id, username, role), never the password hash.
+    # Load the User row when a route needs anything else.
+
+    def __init__(self, id, username, role):
+        self.id = id
+        self.username = username
+        self.role = role
+
+    def __repr__(self):
+        return f'<CachedUser {self.id} {self.username!r}>'
+
+
+class IdentityCache:
+    # LRU of user id -> (username, role) so resolving current_user costs no
+    # query on a warm cache. Writes through the ORM invalidate the entry (see
+    # the mapper listeners below); the TTL bounds how long other processes
+    # can serve a stale role.
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def load(self, user_id):
+        identity = self.cache.get(user_id)
+        if identity is None:
+            identity = db.session.execute(
+                select(User.username, User.role).where(User.id == user_id)
+            ).first()
+            if identity is None:
+                return None
+            identity = tuple(identity)
+            self.cache.set(user_id, identity)
+        return CachedUser(user_id, *identity)
+
+    def invalidate(self, user_id):
+        self.cache.delete(user_id)
+
+
+identity = IdentityCache()
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_identity(mapper, connection, target):
+    identity.invalidate(target.id)
@@ -0,0 +1,186 @@
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SLOWEST_STATEMENT_LENGTH = 200
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RequestTimings:
+    # Collected on flask.g for the current request
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+        self.render_time = 0.0
+        self.render_started = []
+
+    def record_statement(self, statement, elapsed):
+        self.sql_count += 1
+        self.sql_time += elapsed
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = ' '.join(statement.split())[:SLOWEST_STATEMENT_LENGTH]
+
+
+class Histogram:
+    # Cumulative buckets per label value, in Prometheus' histogram layout
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self._lock:
+            series = self._series.setdefault(label, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self, label_name):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label, series in sorted(self._series.items()):
+                label = f'{label_name}="{_escape(label)}"'
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{label}}} {series["sum"]}')
+                lines.append(f'{self.name}_count{{{label}}} {series["count"]}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics:
+    # Opt-in per-request instrumentation (METRICS_ENABLED). Records SQL count,
+    # DB time, the slowest statement and template render time for each request,
+    # sends them back in a Server-Timing header, logs requests slower than
+    # METRICS_SLOW_REQUEST_MS and keeps per-endpoint histograms for /admin/metrics.
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.slow_request_ms = 500
+        self.request_duration = Histogram(
+            'cem_request_duration_seconds', 'Time spent handling a request.', DURATION_BUCKETS)
+        self.db_duration = Histogram(
+            'cem_request_db_seconds', 'Time spent in SQL statements per request.', DURATION_BUCKETS)
+        self.render_duration = Histogram(
+            'cem_request_render_seconds', 'Time spent rendering templates per request.', DURATION_BUCKETS)
+        self.statements = Histogram(
+            'cem_request_sql_statements', 'SQL statements executed per request.', STATEMENT_BUCKETS)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['metrics'] = self
+        if not app.config.get('METRICS_ENABLED', False):
+            return
+        self.enabled = True
+        self.slow_request_ms = app.config.get('METRICS_SLOW_REQUEST_MS', self.slow_request_ms)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        # Listening on the Engine class covers every engine and bind; statements
+        # outside an instrumented request (CLI, background workers) are ignored.
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+
+    def _before_request(self):
+        g.request_timings = RequestTimings()
+
+    def _before_render(self, sender, template, context, **extra):
+        timings = g.get('request_timings')
+        if timings is not None:
+            timings.render_started.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        timings = g.get('request_timings')
+        if timings is not None and timings.render_started:
+            started = timings.render_started.pop()
+            # Only the outermost render counts; includes are part of it
+            if not timings.render_started:
+                timings.render_time += time.perf_counter() - started
+
+    def _after_request(self, response):
+        timings = g.pop('request_timings', None)
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings.started
+        endpoint = request.endpoint or 'unmatched'
+        response.headers.add('Server-Timing', ', '.join([
+            f'db;dur={timings.sql_time * 1000:.2f};desc="{timings.sql_count} queries"',
+            f'render;dur={timings.render_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ]))
+        self.request_duration.observe(endpoint, total)
+        self.db_duration.observe(endpoint, timings.sql_time)
+        self.render_duration.observe(endpoint, timings.render_time)
+        self.statements.observe(endpoint, timings.sql_count)
+        if total * 1000 >= self.slow_request_ms:
+            current_app.logger.warning(
+                'Slow request %s %s: %.1fms, %d queries in %.1fms, render %.1fms; slowest (%.1fms): %s',
+                request.method, request.path, total * 1000, timings.sql_count, timings.sql_time * 1000,
+                timings.render_time * 1000, timings.slowest_time * 1000, timings.slowest_statement
+            )
+        return response
+
+    def render(self):
+        lines = []
+        for histogram in (self.request_duration, self.db_duration, self.render_duration, self.statements):
+            lines.extend(histogram.render('endpoint'))
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for histogram in (self.request_duration, self.db_duration, self.render_duration, self.statements):
+            histogram.clear()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # The start time lives on the statement's own execution context: a
+    # statement that raises never reaches after_cursor_execute, and anything
+    # kept on the pooled connection would outlive it
+    if context is not None and has_request_context() and 'request_timings' in g:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_statement(context, statement)
+
+
+def _handle_error(exception_context):
+    # Failed statements took their time too
+    _record_statement(exception_context.execution_context, exception_context.statement)
+
+
+def _record_statement(context, statement):
+    started = getattr(context, '_metrics_started', None)
+    if started is not None:
+        timings = g.get('request_timings') if has_request_context() else None
+        if timings is not None:
+            timings.record_statement(statement, time.perf_counter() - started)
+
+
+metrics = RequestMetrics()
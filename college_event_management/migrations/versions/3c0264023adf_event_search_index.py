@@ -0,0 +1,53 @@
+"""event search index
+
+Revision ID: 3c0264023adf
+Revises: 05f6bbe40983
+Create Date: 2026-10-18 17:02:58.005446
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c0264023adf'
+down_revision = '05f6bbe40983'
+branch_labels = None
+depends_on = None
+
+
+# FTS5 is SQLite-only; other backends search with LIKE (see search.py)
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS event_fts USING fts5("
+    "name, description, location, content='event', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_ai AFTER INSERT ON event BEGIN "
+    "INSERT INTO event_fts(rowid, name, description, location) "
+    "VALUES (new.id, new.name, new.description, new.location); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_ad AFTER DELETE ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, name, description, location) "
+    "VALUES ('delete', old.id, old.name, old.description, old.location); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_au AFTER UPDATE OF name, description, location ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, name, description, location) "
+    "VALUES ('delete', old.id, old.name, old.description, old.location); "
+    "INSERT INTO event_fts(rowid, name, description, location) "
+    "VALUES (new.id, new.name, new.description, new.location); END",
+)
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for statement in FTS_DDL:
+        op.execute(statement)
+    # Index the events that already exist
+    op.execute("INSERT INTO event_fts(event_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute('DROP TRIGGER IF EXISTS event_fts_au')
+    op.execute('DROP TRIGGER IF EXISTS event_fts_ad')
+    op.execute('DROP TRIGGER IF EXISTS event_fts_ai')
+    op.execute('DROP TABLE IF EXISTS event_fts')
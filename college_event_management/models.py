@@ -1,13 +1,26 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
+from sqlalchemy import MetaData
+from replica import RoutingSession
 
-db = SQLAlchemy()
+# Explicit constraint names keep migrations identical on SQLite and PostgreSQL
+NAMING_CONVENTION = {
+    'ix': 'ix_%(column_0_label)s',
+    'uq': 'uq_%(table_name)s_%(column_0_name)s',
+    'ck': 'ck_%(table_name)s_%(constraint_name)s',
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+    'pk': 'pk_%(table_name)s',
+}
+
+db = SQLAlchemy(metadata=MetaData(naming_convention=NAMING_CONVENTION),
+                session_options={'class_': RoutingSession})
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
-    password = db.Column(db.String(150), nullable=False)
+    # Long enough for scrypt hashes (~162 chars), which PostgreSQL would reject at 150
+    password = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(50), default='student')
     registrations = db.relationship('Registration', backref='user', lazy=True)
     notifications = db.relationship('Notification', backref='user', lazy=True)
@@ -15,6 +28,9 @@ class User(db.Model, UserMixin):
     received_messages = db.relationship('ChatMessage', foreign_keys='ChatMessage.receiver_id', backref='receiver', lazy=True)
 
 class Event(db.Model):
+    __table_args__ = (
+        db.Index('ix_event_date_id', 'date', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
     description = db.Column(db.Text)
@@ -22,26 +38,140 @@ class Event(db.Model):
     location = db.Column(db.String(150))
     max_seats = db.Column(db.Integer, default=100)
     registration_fee = db.Column(db.Float, default=0.0)
-    registrations = db.relationship('Registration', backref='event', lazy=True)
+    # Maintained by reservations.reserve_seat so capacity checks never count rows
+    seats_taken = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # Rows that reference an event go with it through ON DELETE CASCADE
+    # (SQLite needs PRAGMA foreign_keys, see Config.SQLITE_PRAGMAS)
+    registrations = db.relationship('Registration', backref='event', lazy=True, passive_deletes=True)
 
 class Registration(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'event_id', name='uq_registration_user_event'),
+        db.Index('ix_registration_event_id', 'event_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id', ondelete='CASCADE'), nullable=False)
     payment_amount = db.Column(db.Float, default=0.0)
     payment_status = db.Column(db.Boolean, default=False)
     is_confirmed = db.Column(db.Boolean, default=False)
     registration_date = db.Column(db.DateTime, default=datetime.utcnow)
 
+class WaitlistEntry(db.Model):
+    __table_args__ = (
+        # FIFO per event: the head of the queue is the lowest position
+        db.UniqueConstraint('event_id', 'position', name='uq_waitlist_entry_event_position'),
+        db.UniqueConstraint('user_id', 'event_id', name='uq_waitlist_entry_user_event'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id', ondelete='CASCADE'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class EventStats(db.Model):
+    # Per-event rollup maintained by analytics.Analytics.compact()
+    __table_args__ = (
+        db.Index('ix_event_stats_registered', 'registered'),
+    )
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id', ondelete='CASCADE'), primary_key=True)
+    registered = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    cancellations = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    revenue = db.Column(db.Float, default=0.0, server_default='0', nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DailyStats(db.Model):
+    # Per-day rollup, by the UTC day of each registration or cancellation
+    day = db.Column(db.Date, primary_key=True)
+    registrations = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    cancellations = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    revenue = db.Column(db.Float, default=0.0, server_default='0', nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AnalyticsDelta(db.Model):
+    # Pending changes appended by registration writers, folded into the
+    # rollups and deleted by compaction
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id', ondelete='CASCADE'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    registrations = db.Column(db.Integer, default=0, nullable=False)
+    cancellations = db.Column(db.Integer, default=0, nullable=False)
+    revenue = db.Column(db.Float, default=0.0, nullable=False)
+
+# Copies of past events and their rows, moved out of the live tables by
+# archive.archive_events(). Ids are kept; there are no foreign keys.
+class ArchivedEvent(db.Model):
+    __table_args__ = (
+        db.Index('ix_archived_event_date', 'date'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(150), nullable=False)
+    description = db.Column(db.Text)
+    date = db.Column(db.DateTime, nullable=False)
+    location = db.Column(db.String(150))
+    max_seats = db.Column(db.Integer)
+    registration_fee = db.Column(db.Float)
+    seats_taken = db.Column(db.Integer)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ArchivedRegistration(db.Model):
+    __table_args__ = (
+        db.Index('ix_archived_registration_event_id', 'event_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    event_id = db.Column(db.Integer, nullable=False)
+    payment_amount = db.Column(db.Float)
+    payment_status = db.Column(db.Boolean)
+    is_confirmed = db.Column(db.Boolean)
+    registration_date = db.Column(db.DateTime)
+
+class ArchivedNotification(db.Model):
+    __table_args__ = (
+        db.Index('ix_archived_notification_event_id', 'event_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer)
+    event_id = db.Column(db.Integer)
+    message = db.Column(db.String(255))
+    is_read = db.Column(db.Boolean)
+    created_at = db.Column(db.DateTime)
+
 class Notification(db.Model):
+    __table_args__ = (
+        db.Index('ix_notification_user_id_is_read', 'user_id', 'is_read'),
+        # For ON DELETE CASCADE and archival, which find rows by event
+        db.Index('ix_notification_event_id', 'event_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'))
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id', ondelete='CASCADE'))
     message = db.Column(db.String(255))
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class NotificationJob(db.Model):
+    # One notification fan-out. Kept in the database rather than in the
+    # pipeline so every worker process can report its progress.
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id', ondelete='CASCADE'), nullable=False, index=True)
+    message = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(10), default='queued', nullable=False)
+    total = db.Column(db.Integer)
+    sent = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Bumped by every progress write: a job that stops moving lost its worker
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
 class ChatMessage(db.Model):
+    __table_args__ = (
+        # Keyed on the conversation pair, then id, so each pair's entries are in
+        # id order for the before_id cursor on every backend
+        db.Index('ix_chat_message_sender_id_receiver_id', 'sender_id', 'receiver_id', 'id'),
+        db.Index('ix_chat_message_receiver_id_sender_id', 'receiver_id', 'sender_id', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -0,0 +1,180 @@
+import queue
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+from models import db, Registration, Notification, NotificationJob
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_PENDING_JOBS = 100
+# An unfinished job whose row has not moved for this long is reported failed
+DEFAULT_STALE_SECONDS = 900
+UNFINISHED = ('queued', 'running')
+
+
+class PipelineFull(Exception):
+    pass
+
+
+class FanoutJob:
+    # In-process handle on a notification_job row; `finished` is set once this
+    # process's worker is done with it. Other processes read the row.
+    def __init__(self, job_id, event_id, message):
+        self.id = job_id
+        self.event_id = event_id
+        self.message = message
+        self.status = 'queued'
+        self.error = None
+        self.finished = threading.Event()
+
+
+def serialize_job(job):
+    return {
+        'id': job.id,
+        'event_id': job.event_id,
+        'status': job.status,
+        'total': job.total,
+        'sent': job.sent,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class NotificationPipeline:
+    # Fans a notification out to every registrant of an event on background
+    # worker threads, inserting Notification rows in bounded executemany batches
+    # so the admin request that triggered it returns immediately. Jobs run in
+    # the process that queued them; their progress is written to
+    # notification_job, so any worker can answer a status request. If that
+    # process dies the row stops moving, and a status read older than
+    # NOTIFICATION_JOB_STALE_SECONDS marks it failed.
+
+    def __init__(self, app=None, batch_size=DEFAULT_BATCH_SIZE, workers=1, stale_seconds=DEFAULT_STALE_SECONDS):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.stale_seconds = stale_seconds
+        self._queue = queue.Queue(maxsize=MAX_PENDING_JOBS)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._listeners = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get('NOTIFICATION_BATCH_SIZE', self.batch_size)
+        self.workers = app.config.get('NOTIFICATION_WORKERS', self.workers)
+        self.stale_seconds = app.config.get('NOTIFICATION_JOB_STALE_SECONDS', self.stale_seconds)
+        app.extensions['notification_pipeline'] = self
+
+    def on_batch(self, listener):
+        # listener(user_ids) runs after each committed batch
+        self._listeners.append(listener)
+        return listener
+
+    def enqueue_event_fanout(self, event_id, message):
+        # Commits the job row, so call it after the caller's own commit
+        if self._queue.full():
+            raise PipelineFull('Too many notification jobs pending')
+        row = NotificationJob(event_id=event_id, message=message)
+        db.session.add(row)
+        db.session.commit()
+        job = FanoutJob(row.id, event_id, message)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            db.session.execute(delete(NotificationJob).where(NotificationJob.id == job.id))
+            db.session.commit()
+            raise PipelineFull('Too many notification jobs pending')
+        self._start_workers()
+        return job
+
+    def job(self, job_id):
+        job = db.session.get(NotificationJob, job_id)
+        if job is None:
+            return None
+        if job.status in UNFINISHED and job.updated_at < datetime.utcnow() - timedelta(seconds=self.stale_seconds):
+            self._fail_stale(job)
+        return serialize_job(job)
+
+    def _fail_stale(self, job):
+        # Only if the row is still as read: a live worker's progress wins
+        db.session.execute(
+            update(NotificationJob)
+            .where(NotificationJob.id == job.id, NotificationJob.status.in_(UNFINISHED),
+                   NotificationJob.updated_at == job.updated_at)
+            .values(status='failed', error='The worker running this job stopped', finished_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        db.session.refresh(job)
+
+    def _start_workers(self):
+        # Threads start on first use so CLI commands never spawn them
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for _ in range(self.workers - len(self._threads)):
+                thread = threading.Thread(target=self._work, name='notification-pipeline', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self.app.app_context():
+                try:
+                    self._run(job)
+                    job.status = 'done'
+                except Exception as e:
+                    db.session.rollback()
+                    job.status = 'failed'
+                    job.error = str(e)
+                try:
+                    self._record(job, status=job.status, error=job.error, finished_at=datetime.utcnow())
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Could not record the outcome of notification job %s', job.id)
+                finally:
+                    db.session.remove()
+            job.finished.set()
+            self._queue.task_done()
+
+    def _record(self, job, **values):
+        db.session.execute(
+            update(NotificationJob).where(NotificationJob.id == job.id).values(updated_at=datetime.utcnow(), **values)
+        )
+        db.session.commit()
+
+    def _run(self, job):
+        job.status = 'running'
+        total = db.session.execute(
+            select(func.count(Registration.id)).where(Registration.event_id == job.event_id)
+        ).scalar()
+        self._record(job, status='running', total=total)
+        last_id = 0
+        while True:
+            # Keyset over ix_registration_event_id, one short transaction per batch
+            batch = db.session.execute(
+                select(Registration.id, Registration.user_id)
+                .where(Registration.event_id == job.event_id, Registration.id > last_id)
+                .order_by(Registration.id)
+                .limit(self.batch_size)
+            ).all()
+            if not batch:
+                break
+            now = datetime.utcnow()
+            user_ids = [user_id for _, user_id in batch]
+            db.session.execute(Notification.__table__.insert(), [
+                {'user_id': user_id, 'event_id': job.event_id, 'message': job.message,
+                 'is_read': False, 'created_at': now}
+                for user_id in user_ids
+            ])
+            # Progress commits with the batch it counts
+            self._record(job, sent=NotificationJob.sent + len(batch))
+            for listener in self._listeners:
+                listener(user_ids)
+            last_id = batch[-1][0]
+
+
+pipeline = NotificationPipeline()
@@ -0,0 +1,60 @@
+from datetime import datetime
+from sqlalchemy import tuple_
+from models import db, Event
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(event):
+    return f'{event.date.isoformat()}_{event.id}'
+
+
+def decode_cursor(cursor):
+    try:
+        date, event_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(date), int(event_id)
+    except ValueError:
+        raise InvalidCursor(f'Invalid cursor: {cursor!r}')
+
+
+def event_page_query(scope, cursor=None, now=None):
+    # Keyset pagination on (date, id), backed by ix_event_date_id. Upcoming
+    # events page forwards from now; past events page backwards from now.
+    now = now or datetime.now()
+    key = tuple_(Event.date, Event.id)
+    query = db.session.query(Event, Event.seats_taken)
+    if scope == 'upcoming':
+        query = query.filter(Event.date >= now).order_by(Event.date, Event.id)
+        if cursor:
+            query = query.filter(key > tuple_(*decode_cursor(cursor)))
+    elif scope == 'past':
+        query = query.filter(Event.date < now).order_by(Event.date.desc(), Event.id.desc())
+        if cursor:
+            query = query.filter(key < tuple_(*decode_cursor(cursor)))
+    else:
+        raise ValueError(f'Unknown scope: {scope!r}')
+    return query
+
+
+def event_page(scope='upcoming', cursor=None, limit=DEFAULT_PAGE_SIZE, now=None):
+    # Returns (rows, next_cursor); rows are (event, registered_count) so a page
+    # is one query instead of lazy-loading event.registrations per card. The
+    # count is the seats_taken counter that reserve_seat and the waitlist keep.
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = event_page_query(scope, cursor, now).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def serialize_event(snapshot, registered):
+    # snapshot is an event_cache.event_snapshot() dict
+    return {
+        **snapshot,
+        'date': snapshot['date'].isoformat(),
+        'available_seats': snapshot['max_seats'] - registered,
+    }
@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    # While a @read_replica view runs, plain SELECTs go to the 'replica' bind
+    # (when SQLALCHEMY_BINDS has one). Flushes, DML, raw SQL and everything
+    # outside those views use the primary.
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and clause is not None
+            and clause.is_select
+            and has_app_context()
+            and g.get('read_replica')
+            and REPLICA_BIND in self._db.engines
+        ):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(view):
+    # Replicas lag, so only use this on views that tolerate slightly stale reads
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_replica = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.read_replica = False
+    return wrapper
+
+
+@contextmanager
+def use_primary():
+    # Force reads inside a @read_replica view back to the primary
+    previous = g.get('read_replica', False)
+    g.read_replica = False
+    try:
+        yield
+    finally:
+        g.read_replica = previous
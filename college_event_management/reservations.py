@@ -0,0 +1,62 @@
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from models import db, Event, Registration, Notification
+from counters import unread
+from analytics import analytics
+
+
+class ReservationError(Exception):
+    pass
+
+
+class EventFull(ReservationError):
+    pass
+
+
+class AlreadyRegistered(ReservationError):
+    pass
+
+
+def claim_seat(event_id):
+    # Conditional UPDATE: the capacity check and the increment happen in one
+    # statement, so two requests can never both take the last seat.
+    result = db.session.execute(
+        update(Event)
+        .where(Event.id == event_id, Event.seats_taken < Event.max_seats)
+        .values(seats_taken=Event.seats_taken + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def reserve_seat(user_id, event):
+    event_id, event_name = event.id, event.name
+    if not claim_seat(event_id):
+        db.session.rollback()
+        raise EventFull(f'No seats available for {event_name}')
+
+    # Automatically confirm registration (no admin approval needed)
+    registration = Registration(
+        user_id=user_id,
+        event_id=event_id,
+        payment_amount=event.registration_fee,
+        payment_status=True,
+        is_confirmed=True
+    )
+    db.session.add(registration)
+    db.session.add(Notification(
+        user_id=user_id,
+        event_id=event_id,
+        message=f"Your registration for {event_name} is confirmed!"
+    ))
+    try:
+        # Flush first so a duplicate fails here, not in record()'s autoflush
+        db.session.flush()
+        analytics.record(event_id, registrations=1, revenue=event.registration_fee or 0.0)
+        db.session.commit()
+    except IntegrityError:
+        # uq_registration_user_event: the rollback also releases the seat
+        db.session.rollback()
+        raise AlreadyRegistered(f'Already registered for {event_name}')
+    unread.incr(user_id, 'notifications')
+    return registration
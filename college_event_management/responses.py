@@ -0,0 +1,84 @@
+import gzip
+from functools import wraps
+
+from flask import make_response, request
+
+try:
+    import brotli
+except ImportError:
+    # Optional (pip install brotli); without it responses are gzipped
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'application/json', 'application/javascript',
+}
+
+
+def conditional(view):
+    # Weak ETag over the rendered page, so a browser revalidating an unchanged
+    # page gets a 304 without the body. Weak because compression changes the
+    # bytes but not the content. For per-user GET views: the page is still
+    # rendered, the fragment cache keeps that cheap.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if request.method == 'GET' and response.status_code == 200 and not response.is_streamed:
+            response.add_etag(weak=True)
+            response.headers.setdefault('Cache-Control', 'private, no-cache')
+            response.make_conditional(request)
+        return response
+    return wrapper
+
+
+class Compressor:
+    # Compresses text responses of at least COMPRESS_MIN_SIZE bytes with
+    # brotli or gzip, whichever the client accepts (brotli first). Streamed
+    # responses (exports, the chat stream) pass through untouched, since
+    # compressing them would mean buffering them.
+
+    def __init__(self, app=None):
+        self.min_size = 500
+        self.gzip_level = 6
+        # Quality 4 compresses better than gzip -6 at a similar speed; 11 is for static files
+        self.brotli_quality = 4
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['compressor'] = self
+        if not app.config.get('COMPRESS_ENABLED', True):
+            return
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', self.min_size)
+        self.gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', self.gzip_level)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', self.brotli_quality)
+        app.after_request(self._after_request)
+
+    def choose_encoding(self, accept_encodings):
+        if brotli is not None and accept_encodings['br']:
+            return 'br'
+        if accept_encodings['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        # mtime=0 keeps the output identical for identical pages
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def _after_request(self, response):
+        if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding(request.accept_encodings)
+        if encoding is not None:
+            response.set_data(self.compress(data, encoding))
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+
+compressor = Compressor()
@@ -0,0 +1,151 @@
+import re
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import DDL, column, event, func, literal_column, null, or_, select, table
+
+from models import db, Event
+
+DEFAULT_SEARCH_SIZE = 20
+MAX_SEARCH_SIZE = 50
+# Default for SEARCH_MAX_RANKED_MATCHES, see search_events()
+MAX_RANKED_MATCHES = 1000
+# bm25 column weights: a hit in the name outranks location, which outranks description
+RANK_WEIGHTS = (10.0, 1.0, 3.0)
+
+# External-content FTS5 index over event(name, description, location). The
+# triggers keep it in sync with every write to those columns, including bulk
+# imports; seat counter updates do not touch it. prefix='2 3' adds prefix
+# indexes so short "term*" queries stay index lookups.
+# Note: a batch migration that recreates the event table drops the triggers,
+# so such a migration must create them again.
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS event_fts USING fts5("
+    "name, description, location, content='event', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_ai AFTER INSERT ON event BEGIN "
+    "INSERT INTO event_fts(rowid, name, description, location) "
+    "VALUES (new.id, new.name, new.description, new.location); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_ad AFTER DELETE ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, name, description, location) "
+    "VALUES ('delete', old.id, old.name, old.description, old.location); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_au AFTER UPDATE OF name, description, location ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, name, description, location) "
+    "VALUES ('delete', old.id, old.name, old.description, old.location); "
+    "INSERT INTO event_fts(rowid, name, description, location) "
+    "VALUES (new.id, new.name, new.description, new.location); END",
+)
+
+event_fts = table('event_fts', column('rowid'))
+
+
+class InvalidSearch(ValueError):
+    pass
+
+
+# db.create_all() (dev server, bench databases) builds the index too; existing
+# databases get it from the migration
+for statement in FTS_DDL:
+    event.listen(Event.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+
+
+def exclude_search_tables(name, type_, parent_names):
+    # Keeps Alembic autogenerate from proposing to drop the FTS5 tables
+    return not (type_ == 'table' and name.startswith('event_fts'))
+
+
+def search_terms(text):
+    terms = re.findall(r'\w+', text or '')
+    if not terms:
+        raise InvalidSearch('Enter at least one word to search for')
+    return terms[:10]
+
+
+def fts_query(terms):
+    # Every term must match; each is a quoted prefix so "robo" finds "robotics"
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def parse_date(value, name, end=False):
+    # A bare date as the end of a range includes that whole day
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidSearch(f'{name} must be an ISO date, e.g. 2025-03-01')
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def _date_range(statement, date_from, date_to):
+    if date_from is not None:
+        statement = statement.where(Event.date >= date_from)
+    if date_to is not None:
+        statement = statement.where(Event.date < date_to)
+    return statement
+
+
+def search_events(text, date_from=None, date_to=None, limit=DEFAULT_SEARCH_SIZE, max_ranked=None):
+    # Returns (rows, truncated). rows are [(event, registered, rank)] best
+    # match first; rank is bm25 (lower is better) on SQLite and None on
+    # backends that fall back to LIKE. truncated is True when older matches
+    # were left unranked, see below.
+    if db.engine.dialect.name != 'sqlite':
+        return like_search(text, date_from, date_to, limit), False
+    if max_ranked is None:
+        max_ranked = current_app.config.get('SEARCH_MAX_RANKED_MATCHES', MAX_RANKED_MATCHES)
+    limit = max(1, min(limit, MAX_SEARCH_SIZE))
+    match = literal_column('event_fts').op('MATCH')(fts_query(search_terms(text)))
+
+    def matching(*columns):
+        statement = select(*columns).where(match)
+        if date_from is not None or date_to is not None:
+            statement = _date_range(statement.join(Event, Event.id == event_fts.c.rowid), date_from, date_to)
+        return statement
+
+    rank = func.bm25(literal_column('event_fts'), *RANK_WEIGHTS)
+    hits = matching(event_fts.c.rowid.label('event_id'), rank.label('rank'))
+    truncated = False
+    if max_ranked and date_from is None and date_to is None:
+        # bm25 costs about a microsecond per hit, so a very common word would
+        # be scored across thousands of events. Only the newest max_ranked
+        # hits are ranked (SEARCH_MAX_RANKED_MATCHES, 0 ranks them all): find
+        # the lowest rowid among them by walking the index in rowid order,
+        # which needs no scoring. With a date range only the in-range hits
+        # are scored anyway.
+        edge = db.session.execute(
+            matching(event_fts.c.rowid).order_by(event_fts.c.rowid.desc())
+            .offset(max_ranked - 1).limit(2)
+        ).scalars().all()
+        if len(edge) == 2:
+            hits = hits.where(event_fts.c.rowid >= edge[0])
+            truncated = True
+    # Rank and cut to `limit` inside the index, so the join only runs for
+    # the rows actually returned
+    hits = hits.order_by(rank).limit(limit).subquery()
+    statement = (
+        select(Event, Event.seats_taken, hits.c.rank)
+        .join(hits, hits.c.event_id == Event.id)
+        .order_by(hits.c.rank)
+    )
+    return db.session.execute(statement).all(), truncated
+
+
+def like_search(text, date_from=None, date_to=None, limit=DEFAULT_SEARCH_SIZE):
+    # Substring scan over every event: the fallback without FTS5 and the
+    # baseline in "flask bench search"
+    limit = max(1, min(limit, MAX_SEARCH_SIZE))
+    statement = select(Event, Event.seats_taken, null()).order_by(Event.date)
+    for term in search_terms(text):
+        pattern = f'%{term}%'
+        statement = statement.where(or_(
+            Event.name.ilike(pattern), Event.description.ilike(pattern), Event.location.ilike(pattern)
+        ))
+    return db.session.execute(_date_range(statement, date_from, date_to).limit(limit)).all()
+
+
+def rebuild_index():
+    db.session.execute(db.text("INSERT INTO event_fts(event_fts) VALUES ('rebuild')"))
+    db.session.commit()
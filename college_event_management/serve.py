@@ -0,0 +1,100 @@
+import os
+import signal
+import socket
+import sys
+import time
+
+import click
+from waitress.server import create_server
+
+DEFAULT_THREADS = 16
+
+
+def serve(app_factory, host='127.0.0.1', port=8000, workers=1, threads=DEFAULT_THREADS):
+    # Pre-fork server: the parent binds the socket and forks `workers`
+    # processes, each building its own app (so no engine or pool crosses a
+    # fork) and serving it with waitress on a pool of `threads` threads.
+    # Crashed workers are replaced; SIGINT/SIGTERM stop them all. Without
+    # fork (Windows) a single process is used. Any WSGI server can host the
+    # factory instead, e.g. gunicorn -w 4 --threads 8 'app:create_app("config.ProductionConfig")'.
+    # Workers share nothing in memory: a chat stream held by one worker gets
+    # messages sent through another from the broker's database poll
+    # (CHAT_POLL_INTERVAL, on in ProductionConfig), not from the sender.
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.set_inheritable(True)
+    if workers <= 1 or not hasattr(os, 'fork'):
+        _run_worker(app_factory, sock, threads)
+        return
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(app_factory, sock, threads)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for _ in range(workers):
+        spawn()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    click.echo(f'Serving on http://{host}:{port} with {workers} worker processes of {threads} threads', err=True)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            click.echo(f'Worker {pid} exited with status {status}; starting a new one', err=True)
+            time.sleep(1)
+            spawn()
+    sock.close()
+
+
+def _run_worker(app_factory, sock, threads):
+    app = app_factory()
+    server = create_server(app, sockets=[sock], threads=threads)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    signal.signal(signal.SIGINT, lambda signum, frame: sys.exit(0))
+    try:
+        server.run()
+    finally:
+        server.close()
+
+
+@click.command('serve')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=8000, show_default=True)
+@click.option('--workers', '-w', default=os.cpu_count() or 1, show_default=True, help='Worker processes.')
+@click.option('--threads', default=DEFAULT_THREADS, show_default=True, help='Request threads per worker.')
+@click.option('--hash-workers', type=int, default=None,
+              help='Password hash processes per worker.  [default: cores / workers]')
+@click.option('--config', 'config_object', default='config.ProductionConfig', show_default=True)
+def serve_command(host, port, workers, threads, hash_workers, config_object):
+    """Run the production server: several processes, each with a bounded thread pool."""
+    from app import create_app  # app imports this module for its CLI command
+    if hash_workers is None:
+        # Every worker has its own hash pool: together they fill the cores once
+        hash_workers = max((os.cpu_count() or 1) // max(workers, 1), 1)
+    # Every chat stream holds a thread for as long as it is open; leave the
+    # other half of the pool for ordinary requests
+    serve(lambda: create_app(config_object, CHAT_MAX_STREAMS=max(threads // 2, 1),
+                             PASSWORD_HASH_WORKERS=hash_workers),
+          host, port, workers, threads)
@@ -0,0 +1,15 @@
+import pytest
+
+from bench import scratch_app
+from models import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    # A full app on its own SQLite file, the same scratch setup the benchmarks
+    # use. Tests push their own app contexts: requests made inside one would
+    # share its g, and with it the logged-in user.
+    app = scratch_app(str(tmp_path / 'test.db'), routes=True)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
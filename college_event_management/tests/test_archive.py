@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+from analytics import analytics
+from archive import archive_events, delete_event, TableArchive
+from bench import seed_students
+from models import (db, Event, Registration, Notification, WaitlistEntry, AnalyticsDelta, EventStats,
+                    ArchivedEvent, ArchivedRegistration, ArchivedNotification)
+from reservations import reserve_seat
+from waitlist import join_waitlist, cancel_registration
+
+EVENT_TABLES = (Registration, Notification, WaitlistEntry, AnalyticsDelta, EventStats)
+
+
+def busy_event(user_ids, date, seats=5):
+    # Full, with a waitlist, a notification per student and analytics rows
+    event = Event(name='Fest', date=date, max_seats=seats)
+    db.session.add(event)
+    db.session.commit()
+    for user_id in user_ids[:seats]:
+        reserve_seat(user_id, event)
+    for user_id in user_ids[seats:]:
+        join_waitlist(user_id, event.id)
+    db.session.add_all(Notification(user_id=user_id, event_id=event.id, message='Update', is_read=False)
+                       for user_id in user_ids)
+    db.session.commit()
+    return event.id
+
+
+def rows_for(event_id):
+    return {model.__tablename__: model.query.filter_by(event_id=event_id).count() for model in EVENT_TABLES}
+
+
+def test_delete_leaves_no_rows_behind(app):
+    with app.app_context():
+        user_ids = seed_students(8)
+        soon = datetime.now() + timedelta(days=1)
+        doomed, kept = busy_event(user_ids, soon), busy_event(user_ids, soon)
+        # Some changes folded into event_stats, a cancellation's still pending
+        analytics.compact()
+        cancel_registration(user_ids[0], doomed)
+        kept_rows = rows_for(kept)
+        assert all(rows_for(doomed).values())
+
+        # A batch smaller than the event's rows, so the delete takes several
+        assert delete_event(doomed, batch_size=2)
+        assert db.session.get(Event, doomed) is None
+        assert set(rows_for(doomed).values()) == {0}
+        assert rows_for(kept) == kept_rows
+
+
+def test_table_archive_keeps_every_row_in_exactly_one_place(app):
+    with app.app_context():
+        user_ids = seed_students(8)
+        now = datetime.now()
+        old = [busy_event(user_ids, now - timedelta(days=days)) for days in (400, 300, 200)]
+        recent = busy_event(user_ids, now - timedelta(days=10))
+        live = (Event, Registration, Notification)
+        archived = (ArchivedEvent, ArchivedRegistration, ArchivedNotification)
+        before = [model.query.count() for model in live]
+        old_registrations = {row.id for row in Registration.query.filter(Registration.event_id.in_(old))}
+
+        events, rows = archive_events(now - timedelta(days=180), batch_size=3, archive=TableArchive())
+        assert events == len(old)
+        after = [model.query.count() for model in live]
+        moved = [model.query.count() for model in archived]
+        assert [a + m for a, m in zip(after, moved)] == before
+        assert rows == sum(moved[1:])
+        assert {row.id for row in ArchivedRegistration.query} == old_registrations
+        assert {row[0] for row in db.session.query(Event.id)} == {recent}
+        # A second run finds nothing left to move
+        assert archive_events(now - timedelta(days=180), batch_size=3) == (0, 0)
@@ -0,0 +1,69 @@
+from werkzeug.security import generate_password_hash
+
+from auth import hash_method, login_limiter, passwords
+from bench import scratch_app, seed_students, BENCH_HASH_METHOD
+from models import db, User
+
+
+def limited(app):
+    app.config['LOGIN_RATE_LIMIT_ENABLED'] = True
+    login_limiter.init_app(app)
+    return app.test_client()
+
+
+def log_in(client, username, password='bench', ip='10.0.0.1', **headers):
+    return client.post('/login', data={'username': username, 'password': password},
+                       environ_base={'REMOTE_ADDR': ip}, headers=headers).status_code
+
+
+def test_successful_logins_from_one_address_are_not_limited(app):
+    with app.app_context():
+        seed_students(60)
+    client = limited(app)
+    # A campus NAT: more students than the IP burst, all from one address
+    assert {log_in(client, f'student{i}') for i in range(60)} == {302}
+
+
+def test_failed_logins_are_limited_per_user_and_per_address(app):
+    with app.app_context():
+        seed_students(60)
+    client = limited(app)
+    assert [log_in(client, 'student0', 'wrong') for _ in range(6)] == [200] * 5 + [429]
+    # Other accounts still work, and a success gives the account its burst back
+    assert log_in(client, 'student1') == 302
+    # Spraying one password across accounts runs out of the address's tokens
+    codes = [log_in(client, f'student{i}', 'wrong', ip='10.0.0.2') for i in range(2, 60)]
+    assert codes[:50] == [200] * 50 and 429 in codes[50:]
+    assert log_in(client, 'student1', ip='10.0.0.3') == 302
+
+
+def test_forwarded_address_is_used_behind_a_proxy(tmp_path):
+    app = scratch_app(str(tmp_path / 'proxy.db'), routes=True, PROXY_COUNT=1, LOGIN_RATE_LIMIT_ENABLED=True)
+    with app.app_context():
+        seed_students(1)
+    client = app.test_client()
+    for i in range(50):
+        log_in(client, f'nobody{i}', 'wrong', ip='10.0.0.9', **{'X-Forwarded-For': '192.0.2.1'})
+    assert log_in(client, 'student0', ip='10.0.0.9', **{'X-Forwarded-For': '192.0.2.1'}) == 429
+    # Same proxy, another client
+    assert log_in(client, 'student0', ip='10.0.0.9', **{'X-Forwarded-For': '192.0.2.2'}) == 302
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_login_upgrades_hashes_made_with_older_parameters(app):
+    with app.app_context():
+        old_hash = generate_password_hash('secret', method='pbkdf2:sha256:2')
+        user = User(username='alice', password=old_hash, role='student')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    assert log_in(app.test_client(), 'alice', 'secret') == 302
+    with app.app_context():
+        upgraded = db.session.get(User, user_id).password
+        assert hash_method(upgraded) == passwords.method_prefix() == BENCH_HASH_METHOD
+        assert passwords.verify(upgraded, 'secret')
+    # A current hash is left alone
+    assert log_in(app.test_client(), 'alice', 'secret') == 302
+    with app.app_context():
+        assert db.session.get(User, user_id).password == upgraded
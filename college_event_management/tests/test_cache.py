@@ -0,0 +1,33 @@
+import os
+import time
+
+import pytest
+
+from cache import FileCache, make_cache
+
+
+def test_file_cache_refuses_a_directory_others_can_write(tmp_path):
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+    with pytest.raises(RuntimeError, match='0700'):
+        FileCache(str(shared))
+    with pytest.raises(ValueError):
+        make_cache('file')
+    cache = FileCache(str(tmp_path / 'private'))
+    assert os.stat(cache.directory).st_mode & 0o777 == 0o700
+
+
+def test_file_cache_sweeps_expired_entries_and_caps_its_size(tmp_path):
+    cache = FileCache(str(tmp_path / 'cache'), ttl=60, maxsize=10)
+    for i in range(20):
+        cache.set(f'gone{i}', i, ttl=0.01)
+    time.sleep(0.05)
+    for i in range(15):
+        cache.set(f'kept{i}', i, ttl=60 + i)
+    # The first set swept; these ran before the next sweep is due
+    assert len(cache) == 15 + 20
+    assert cache.sweep() == 20 + 5
+    assert len(cache) == 10
+    # The entries closest to expiry went first
+    assert [cache.get(f'kept{i}') for i in (4, 5, 14)] == [None, 5, 14]
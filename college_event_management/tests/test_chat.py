@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from bench import bulk_insert, login_as, seed_students
+from chat_stream import broker, open_stream, serialize_message, STREAM_BACKLOG_SIZE
+from models import db, ChatMessage, User
+
+
+def seed_chat(count):
+    # Students write to the admin; returns (admin_id, student_ids)
+    student_ids = seed_students(2)
+    admin = User(username='admin', password='-', role='admin')
+    db.session.add(admin)
+    db.session.commit()
+    now = datetime.utcnow()
+    bulk_insert(ChatMessage, ({'sender_id': student_ids[i % 2], 'receiver_id': admin.id, 'content': f'Hi {i}',
+                               'timestamp': now, 'is_read': False} for i in range(count)))
+    return admin.id, student_ids
+
+
+def test_stream_replays_at_most_the_backlog_size(app):
+    with app.app_context():
+        admin_id, _ = seed_chat(STREAM_BACKLOG_SIZE + 1)
+        _, stream = open_stream(admin_id, 0)
+        assert next(stream).startswith(':')
+        assert next(stream) == 'event: reset\ndata: {}\n\n'
+        _, stream = open_stream(admin_id, 1)
+        next(stream)
+        replayed = [next(stream) for _ in range(STREAM_BACKLOG_SIZE)]
+        stream.close()
+    assert replayed[0].startswith('id: 2\n') and replayed[-1].startswith(f'id: {STREAM_BACKLOG_SIZE + 1}\n')
+
+
+def test_admin_stream_resumes_after_the_newest_message_overall(app):
+    with app.app_context():
+        admin_id, student_ids = seed_chat(10)
+        newest = db.session.query(db.func.max(ChatMessage.id)).scalar()
+    client = app.test_client()
+    login_as(client, admin_id)
+    # Both the older conversation and a student with no messages at all
+    for student_id in (student_ids[0], 999):
+        page = client.get(f'/admin/chat?student_id={student_id}').get_data(as_text=True)
+        assert f'data-last-id="{newest}"' in page
+
+
+def test_streams_get_messages_saved_by_other_workers(app):
+    broker.poll_interval = 0.05
+    try:
+        with app.app_context():
+            admin_id, student_ids = seed_chat(1)
+            _, stream = open_stream(admin_id, 1)
+            next(stream)
+            # One saved by another process, which only the poll finds, then a
+            # newer one saved here: both arrive, in order
+            sent = []
+            for student_id in student_ids:
+                message = ChatMessage(sender_id=student_id, receiver_id=admin_id, content='Hi',
+                                      timestamp=datetime.utcnow(), is_read=False)
+                db.session.add(message)
+                db.session.commit()
+                sent.append(message.id)
+            broker.saved(serialize_message(message))
+            assert [next(stream).split('\n')[0] for _ in sent] == [f'id: {message_id}' for message_id in sent]
+            stream.close()
+    finally:
+        broker.poll_interval = 0
@@ -0,0 +1,11 @@
+import pytest
+
+from app import create_app
+from config import ProductionConfig
+
+
+def test_production_refuses_to_start_without_a_secret_key(monkeypatch, tmp_path):
+    monkeypatch.setattr(ProductionConfig, 'SECRET_KEY', None)
+    monkeypatch.delenv('FLASK_SECRET_KEY', raising=False)
+    with pytest.raises(RuntimeError, match='SECRET_KEY'):
+        create_app(ProductionConfig, SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path}/test.db')
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+from jinja2 import DictLoader
+
+from bench import count_statements, login_as, seed_events, seed_students
+from event_cache import event_cache, EVENT_FIELDS
+from fragments import fragment_cache
+from models import db, Event, User
+from queries import event_page
+from reservations import reserve_seat
+
+DASHBOARDS = (('admin', '/admin/dashboard'), ('student', '/student/dashboard'))
+
+
+def dashboard_statements(app, accounts):
+    with app.app_context():
+        engine = db.engine
+    counts = {}
+    for role, path in DASHBOARDS:
+        client = app.test_client()
+        login_as(client, accounts[role])
+        # Warm the identity cache, then count a listing cache miss
+        assert client.get(path).status_code == 200
+        event_cache.invalidate_listings()
+        with count_statements(engine) as statements:
+            assert client.get(path).status_code == 200
+        counts[path] = len(statements)
+    return counts
+
+
+def test_dashboard_statement_count_does_not_grow_with_data(app):
+    with app.app_context():
+        user_ids = seed_students(30)
+        admin = User(username='admin', password='-', role='admin')
+        db.session.add(admin)
+        db.session.commit()
+        accounts = {'admin': admin.id, 'student': user_ids[0]}
+        seed_events(2, 2, user_ids[:2])
+    small = dashboard_statements(app, accounts)
+
+    with app.app_context():
+        now = datetime.now()
+        for i in range(60):
+            event = Event(name=f'Extra {i}', date=now + timedelta(hours=i - 30), max_seats=50)
+            db.session.add(event)
+            db.session.commit()
+            for user_id in user_ids[2:12]:
+                reserve_seat(user_id, event)
+    assert dashboard_statements(app, accounts) == small
+
+
+def test_listing_seat_counts_follow_reservations(app):
+    with app.app_context():
+        user_ids = seed_students(3)
+        event = Event(name='Fest', date=datetime.now() + timedelta(days=1), max_seats=5)
+        db.session.add(event)
+        db.session.commit()
+        for user_id in user_ids:
+            reserve_seat(user_id, event)
+        (listed, registered), = event_page('upcoming')[0]
+        assert (listed.id, registered) == (event.id, 3)
+
+
+def test_card_cache_follows_template_edits(app):
+    event = dict.fromkeys(EVENT_FIELDS)
+    event['id'] = 1
+    with app.app_context():
+        app.jinja_env.loader = DictLoader({'_card.html': 'old {{ event.id }}'})
+        assert fragment_cache.card('_card.html', event, 0) == 'old 1'
+        # A new loader stands in for an edited file: Jinja compiles it afresh
+        app.jinja_env.loader = DictLoader({'_card.html': 'new {{ event.id }}'})
+        assert fragment_cache.card('_card.html', event, 0) == 'new 1'
@@ -0,0 +1,35 @@
+from app import load_user
+from bench import count_statements, login_as, seed_students
+from models import db, User
+
+
+def test_warm_load_user_runs_no_sql(app):
+    with app.app_context():
+        user_ids = seed_students(5)
+        for user_id in user_ids:
+            load_user(str(user_id))
+        with count_statements(db.engine) as statements:
+            loaded = [load_user(str(user_id)) for user_id in user_ids]
+    assert statements == []
+    assert [user.id for user in loaded] == user_ids
+
+
+def test_warm_request_resolves_current_user_without_sql(app):
+    with app.app_context():
+        user_id, = seed_students(1)
+        engine = db.engine
+    client = app.test_client()
+    login_as(client, user_id)
+    client.get('/api/unread')
+    with count_statements(engine) as statements:
+        assert client.get('/api/unread').status_code == 200
+    assert not any('FROM user' in statement for statement in statements)
+
+
+def test_user_update_invalidates_cached_identity(app):
+    with app.app_context():
+        user_id, = seed_students(1)
+        assert load_user(str(user_id)).role == 'student'
+        db.session.get(User, user_id).role = 'admin'
+        db.session.commit()
+        assert load_user(str(user_id)).role == 'admin'
@@ -0,0 +1,13 @@
+import pytest
+
+from bench import HOT_QUERIES, query_plan, seed_hot_tables
+from models import db
+
+
+@pytest.mark.parametrize('name, expected, build', HOT_QUERIES, ids=[name for name, _, _ in HOT_QUERIES])
+def test_hot_query_uses_its_index(app, name, expected, build):
+    with app.app_context():
+        students, events = seed_hot_tables(2000)
+        db.session.execute(db.text('ANALYZE'))
+        plan = query_plan(build({'user': students // 2, 'event': events // 2}))
+    assert expected in plan
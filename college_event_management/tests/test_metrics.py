@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import g
+
+from bench import count_statements, seed_students
+from metrics import metrics, RequestTimings
+from models import db, Event
+from reservations import reserve_seat, AlreadyRegistered
+
+
+def test_failed_statements_are_timed_and_leave_nothing_on_the_connection(app):
+    app.config['METRICS_ENABLED'] = True
+    metrics.init_app(app)
+    with app.test_request_context():
+        user_id = seed_students(1)[0]
+        event = Event(name='Fest', date=datetime.now() + timedelta(days=1), max_seats=5)
+        db.session.add(event)
+        db.session.commit()
+        reserve_seat(user_id, event)
+
+        g.request_timings = RequestTimings()
+        info = db.session.connection().info
+        before = dict(info)
+        with count_statements(db.engine) as statements:
+            for _ in range(3):
+                with pytest.raises(AlreadyRegistered):
+                    reserve_seat(user_id, event)
+        # Every statement is timed, the failed inserts included, and none
+        # leaves a start time behind on the pooled connection
+        assert g.request_timings.sql_count == len(statements)
+        assert db.session.connection().info == before
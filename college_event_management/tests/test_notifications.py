@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from bench import seed_events, seed_students
+from models import db, NotificationJob
+from notifications import NotificationPipeline, pipeline
+
+
+def test_job_status_is_readable_from_another_worker(app):
+    with app.app_context():
+        user_ids = seed_students(3)
+        event_id, = seed_events(1, 3, user_ids)
+        job = pipeline.enqueue_event_fanout(event_id, 'Moved to room 101')
+    assert job.finished.wait(10)
+    # A pipeline that never saw the job stands in for another worker process
+    other_worker = NotificationPipeline(app)
+    with app.app_context():
+        status = other_worker.job(job.id)
+    assert (status['status'], status['total'], status['sent']) == ('done', 3, 3)
+
+
+def test_jobs_left_behind_by_a_dead_worker_are_reported_failed(app):
+    with app.app_context():
+        user_ids = seed_students(1)
+        event_id, = seed_events(1, 1, user_ids)
+        long_ago = datetime.utcnow() - timedelta(seconds=pipeline.stale_seconds + 1)
+        stalled = NotificationJob(event_id=event_id, message='Hi', status='running', total=1,
+                                  created_at=long_ago, updated_at=long_ago)
+        # Queued a while ago but still making progress
+        moving = NotificationJob(event_id=event_id, message='Hi', status='running', total=1,
+                                 created_at=long_ago, updated_at=datetime.utcnow())
+        db.session.add_all([stalled, moving])
+        db.session.commit()
+        assert pipeline.job(stalled.id)['status'] == 'failed'
+        assert pipeline.job(moving.id)['status'] == 'running'
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from bench import login_as, seed_students
+from models import db, Event
+from queries import event_page
+
+
+def add_events(dates):
+    events = [Event(name=f'Event {i}', date=date, max_seats=10) for i, date in enumerate(dates)]
+    db.session.add_all(events)
+    db.session.commit()
+    return [(event.date, event.id) for event in events]
+
+
+def walk(scope, limit, now):
+    # Every page in order, following next_cursor until it runs out
+    keys, cursor = [], None
+    while True:
+        rows, cursor = event_page(scope, cursor, limit, now)
+        assert len(rows) <= limit
+        keys.extend((event.date, event.id) for event, _ in rows)
+        if cursor is None:
+            return keys
+
+
+def test_pages_cover_every_event_once_across_date_ties(app):
+    now = datetime(2026, 6, 1, 12)
+    with app.app_context():
+        # Runs of identical dates longer than a page, on both sides of now
+        dates = [now + timedelta(days=day) for day in (-3, -2, 1, 2) for _ in range(7)]
+        keys = add_events(dates)
+        upcoming = walk('upcoming', 3, now)
+        past = walk('past', 3, now)
+    assert upcoming == sorted(key for key in keys if key[0] >= now)
+    # Past pages run backwards from now, newest first
+    assert past == sorted((key for key in keys if key[0] < now), reverse=True)
+
+
+def test_api_pages_follow_the_cursor_and_reject_bad_ones(app):
+    with app.app_context():
+        user_id = seed_students(1)[0]
+        start = datetime.now() + timedelta(days=1)
+        keys = add_events([start] * 5 + [start + timedelta(days=1)] * 5)
+    client = app.test_client()
+    login_as(client, user_id)
+
+    ids, after = [], None
+    while True:
+        page = client.get('/api/events', query_string={'limit': 4, **({'after': after} if after else {})}).get_json()
+        ids.extend(event['id'] for event in page['events'])
+        after = page['next']
+        if after is None:
+            break
+    assert ids == [event_id for _, event_id in sorted(keys)]
+
+    for cursor in ('nonsense', '2026-01-01T00:00:00_x', 'not-a-date_5'):
+        response = client.get('/api/events', query_string={'after': cursor})
+        assert response.status_code == 400 and response.get_json()['success'] is False
+        assert client.get('/student/dashboard', query_string={'after': cursor}).status_code == 400
+    assert client.get('/api/events', query_string={'scope': 'sideways'}).status_code == 400
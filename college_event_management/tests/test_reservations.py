@@ -0,0 +1,62 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from analytics import analytics
+from bench import seed_students
+from models import db, Event, EventStats, Registration
+from reservations import reserve_seat, AlreadyRegistered, EventFull
+
+
+def make_event(seats):
+    event = Event(name='Fest', date=datetime.now() + timedelta(days=7), max_seats=seats, registration_fee=5.0)
+    db.session.add(event)
+    db.session.commit()
+    return event
+
+
+def test_duplicate_registration_raises_already_registered(app):
+    with app.app_context():
+        user_id, = seed_students(1)
+        event = make_event(5)
+        reserve_seat(user_id, event)
+        with pytest.raises(AlreadyRegistered):
+            reserve_seat(user_id, event)
+        db.session.refresh(event)
+        assert event.seats_taken == 1
+        analytics.compact()
+        assert db.session.get(EventStats, event.id).registered == 1
+
+
+def test_concurrent_registrations_never_oversell(app):
+    with app.app_context():
+        user_ids = seed_students(40)
+        event_id = make_event(25).id
+
+    outcomes, errors = [], []
+
+    def worker(chunk):
+        with app.app_context():
+            for user_id in chunk:
+                try:
+                    reserve_seat(user_id, db.session.get(Event, event_id))
+                    outcomes.append('ok')
+                except (AlreadyRegistered, EventFull) as e:
+                    outcomes.append(type(e).__name__)
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(e)
+
+    # Every student tries twice
+    attempts = user_ids + user_ids
+    threads = [threading.Thread(target=worker, args=(attempts[i::8],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with app.app_context():
+        rows = Registration.query.filter_by(event_id=event_id).count()
+        assert rows == outcomes.count('ok') == db.session.get(Event, event_id).seats_taken == 25
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta
+
+from bench import login_as, seed_students
+from models import db, Event
+from search import search_events
+
+
+def test_capped_ranking_reports_truncation(app):
+    with app.app_context():
+        user_id, = seed_students(1)
+        now = datetime.now()
+        db.session.add_all(Event(name=f'Robotics meetup {i}', date=now + timedelta(days=i), max_seats=10)
+                           for i in range(5))
+        db.session.commit()
+
+        rows, truncated = search_events('robotics', max_ranked=2)
+        assert truncated and len(rows) == 2
+        rows, truncated = search_events('robotics', max_ranked=5)
+        assert not truncated and len(rows) == 5
+        rows, truncated = search_events('robotics', max_ranked=0)
+        assert not truncated and len(rows) == 5
+
+    app.config['SEARCH_MAX_RANKED_MATCHES'] = 3
+    client = app.test_client()
+    login_as(client, user_id)
+    assert client.get('/api/events/search?q=robo').get_json()['truncated'] is True
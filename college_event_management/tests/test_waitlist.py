@@ -0,0 +1,107 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from bench import seed_students
+from models import db, Event, Registration, Notification, WaitlistEntry
+from reservations import reserve_seat, EventFull, AlreadyRegistered
+from waitlist import join_waitlist, cancel_registration, waitlist_place, AlreadyWaitlisted
+
+
+def full_event(user_ids, seats=2):
+    event = Event(name='Fest', date=datetime.now() + timedelta(days=7), max_seats=seats)
+    db.session.add(event)
+    db.session.commit()
+    for user_id in user_ids[:seats]:
+        reserve_seat(user_id, event)
+    return event
+
+
+def check_invariants(event_id):
+    event = db.session.get(Event, event_id)
+    db.session.refresh(event)
+    registered = {row[0] for row in db.session.query(Registration.user_id).filter_by(event_id=event_id)}
+    waiting = {row[0] for row in db.session.query(WaitlistEntry.user_id).filter_by(event_id=event_id)}
+    assert len(registered) == event.seats_taken <= event.max_seats
+    assert not registered & waiting
+    assert not (waiting and event.seats_taken < event.max_seats)
+    return registered, waiting
+
+
+def test_cancellation_promotes_the_head_of_the_queue(app):
+    with app.app_context():
+        user_ids = seed_students(5)
+        event = full_event(user_ids)
+        with pytest.raises(EventFull):
+            reserve_seat(user_ids[2], event)
+        assert [join_waitlist(user_id, event.id) for user_id in user_ids[2:]] == [1, 2, 3]
+        with pytest.raises(AlreadyWaitlisted):
+            join_waitlist(user_ids[2], event.id)
+
+        assert cancel_registration(user_ids[0], event.id) == [user_ids[2]]
+        registered, waiting = check_invariants(event.id)
+        assert registered == {user_ids[1], user_ids[2]}
+        assert [waitlist_place(user_id, event.id) for user_id in user_ids[3:]] == [1, 2]
+        assert Notification.query.filter(Notification.user_id == user_ids[2],
+                                         Notification.message.like('A seat opened up%')).count() == 1
+
+
+def test_concurrent_cancellations_and_joins_keep_the_invariants(app):
+    with app.app_context():
+        user_ids = seed_students(60)
+        holders, queued, newcomers = user_ids[:10], user_ids[10:40], user_ids[40:]
+        event = full_event(holders, seats=10)
+        event_id = event.id
+        for user_id in queued:
+            join_waitlist(user_id, event_id)
+
+    promoted, errors = [], []
+
+    def worker(tasks):
+        with app.app_context():
+            for kind, user_id in tasks:
+                try:
+                    if kind == 'cancel':
+                        promoted.extend(cancel_registration(user_id, event_id))
+                    elif join_waitlist(user_id, event_id) is None:
+                        promoted.append(user_id)
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(e)
+
+    tasks = [('cancel', user_id) for user_id in holders] + [('join', user_id) for user_id in newcomers]
+    threads = [threading.Thread(target=worker, args=(tasks[i::4],)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with app.app_context():
+        registered, waiting = check_invariants(event_id)
+    # Ten seats freed, ten students from the front of the original queue got them
+    assert sorted(promoted) == sorted(queued[:10])
+    assert registered == set(queued[:10])
+    assert waiting == set(queued[10:]) | set(newcomers)
+
+
+def test_registered_students_cannot_block_the_queue(app):
+    with app.app_context():
+        user_ids = seed_students(4)
+        event = full_event(user_ids, seats=2)
+        # A double-submitted registration: the seat went to the first request
+        with pytest.raises(AlreadyRegistered):
+            join_waitlist(user_ids[1], event.id)
+        assert waitlist_place(user_ids[1], event.id) == 0
+
+        # An entry that slipped past the check on a racing backend is dropped
+        # at promotion instead of colliding with the registration
+        assert join_waitlist(user_ids[2], event.id) == 1
+        db.session.add(WaitlistEntry(user_id=user_ids[1], event_id=event.id, position=0,
+                                     created_at=datetime.utcnow()))
+        db.session.commit()
+        assert cancel_registration(user_ids[0], event.id) == [user_ids[2]]
+        registered, waiting = check_invariants(event.id)
+        assert registered == {user_ids[1], user_ids[2]}
+        assert waiting == set()
@@ -0,0 +1,170 @@
+from datetime import datetime
+
+from sqlalchemy import delete, exists, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Event, Registration, Notification, WaitlistEntry
+from counters import unread
+from analytics import analytics
+from reservations import ReservationError, AlreadyRegistered
+
+# Concurrent joins can pick the same position on backends that run writers in
+# parallel; uq_waitlist_entry_event_position rejects all but one and the rest retry
+JOIN_ATTEMPTS = 5
+
+
+class AlreadyWaitlisted(ReservationError):
+    pass
+
+
+class NotRegistered(ReservationError):
+    pass
+
+
+# Invariant: an event never has a free seat while its waitlist is non-empty.
+# Every path that frees seats (cancel_registration, raising max_seats in
+# edit_event) or adds a waiter (join_waitlist) calls promote() in the same
+# transaction, so freed seats go to the queue before anyone else can claim them.
+
+
+def promote(event_id):
+    # Moves the head of the waitlist into the free seats and returns the
+    # promoted user ids. Runs inside the caller's transaction and after it has
+    # written to this event's seats or waitlist: on SQLite that write holds
+    # the database write lock, elsewhere FOR UPDATE locks the event row, so
+    # promotions for one event run one at a time and never oversell.
+    # The caller commits, then passes the ids to notify_promoted().
+    row = db.session.execute(
+        select(Event.name, Event.registration_fee, Event.max_seats - Event.seats_taken)
+        .where(Event.id == event_id)
+        .with_for_update()
+    ).first()
+    if row is None or row[2] <= 0:
+        return []
+    event_name, fee, free = row
+    # A waiter who got a seat some other way (a racing reserve_seat) would
+    # collide with their own registration; they leave the queue instead
+    db.session.execute(
+        delete(WaitlistEntry)
+        .where(WaitlistEntry.event_id == event_id, registered(WaitlistEntry.user_id, event_id))
+        .execution_options(synchronize_session=False)
+    )
+    entries = db.session.execute(
+        select(WaitlistEntry.id, WaitlistEntry.user_id)
+        .where(WaitlistEntry.event_id == event_id)
+        .order_by(WaitlistEntry.position)
+        .limit(free)
+    ).all()
+    if not entries:
+        return []
+
+    user_ids = [user_id for _, user_id in entries]
+    now = datetime.utcnow()
+    db.session.execute(delete(WaitlistEntry).where(WaitlistEntry.id.in_([entry_id for entry_id, _ in entries])))
+    db.session.execute(
+        update(Event)
+        .where(Event.id == event_id)
+        .values(seats_taken=Event.seats_taken + len(user_ids))
+        .execution_options(synchronize_session=False)
+    )
+    # One executemany per table however many seats opened up
+    db.session.execute(Registration.__table__.insert(), [
+        {'user_id': user_id, 'event_id': event_id, 'payment_amount': fee, 'payment_status': True,
+         'is_confirmed': True, 'registration_date': now}
+        for user_id in user_ids
+    ])
+    db.session.execute(Notification.__table__.insert(), [
+        {'user_id': user_id, 'event_id': event_id, 'is_read': False, 'created_at': now,
+         'message': f'A seat opened up: your registration for {event_name} is confirmed!'}
+        for user_id in user_ids
+    ])
+    analytics.record(event_id, registrations=len(user_ids), revenue=(fee or 0.0) * len(user_ids))
+    return user_ids
+
+
+def notify_promoted(user_ids):
+    # After the commit, so a rollback never leaves counts too high
+    for user_id in user_ids:
+        unread.incr(user_id, 'notifications')
+
+
+def registered(user_id, event_id):
+    return exists().where(Registration.user_id == user_id, Registration.event_id == event_id)
+
+
+def join_waitlist(user_id, event_id):
+    # Appends the student at max(position) + 1 in a single INSERT ... SELECT,
+    # which inserts nothing when they already hold a seat (a double-submitted
+    # registration). Returns their place in line, or None when a seat had
+    # already opened up and they were registered instead.
+    next_position = (
+        select(literal(user_id), literal(event_id), func.coalesce(func.max(WaitlistEntry.position), 0) + 1,
+               literal(datetime.utcnow()))
+        .where(WaitlistEntry.event_id == event_id)
+        .having(~registered(user_id, event_id))
+    )
+    for _ in range(JOIN_ATTEMPTS):
+        try:
+            result = db.session.execute(
+                insert(WaitlistEntry).from_select(['user_id', 'event_id', 'position', 'created_at'], next_position)
+            )
+            if result.rowcount == 0:
+                db.session.rollback()
+                raise AlreadyRegistered('Already registered for this event')
+            promoted = promote(event_id)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            if waitlist_place(user_id, event_id):
+                raise AlreadyWaitlisted('Already on the waitlist for this event')
+            continue
+        notify_promoted(promoted)
+        return None if user_id in promoted else waitlist_place(user_id, event_id)
+    raise ReservationError('The waitlist is busy, please try again')
+
+
+def leave_waitlist(user_id, event_id):
+    result = db.session.execute(
+        delete(WaitlistEntry).where(WaitlistEntry.user_id == user_id, WaitlistEntry.event_id == event_id)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def waitlist_place(user_id, event_id):
+    # 1-based place in line, 0 when not waiting. Positions keep gaps left by
+    # promotions, so this counts the entries ahead over the (event_id, position) index.
+    mine = (
+        select(WaitlistEntry.position)
+        .where(WaitlistEntry.user_id == user_id, WaitlistEntry.event_id == event_id)
+        .scalar_subquery()
+    )
+    return db.session.execute(
+        select(func.count(WaitlistEntry.id))
+        .where(WaitlistEntry.event_id == event_id, WaitlistEntry.position <= mine)
+    ).scalar()
+
+
+def cancel_registration(user_id, event_id):
+    # Frees the seat and hands it to the head of the waitlist in one
+    # transaction; returns the promoted user ids
+    refund = db.session.execute(
+        delete(Registration)
+        .where(Registration.user_id == user_id, Registration.event_id == event_id)
+        .returning(Registration.payment_amount)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if refund is None:
+        db.session.rollback()
+        raise NotRegistered('You are not registered for this event')
+    db.session.execute(
+        update(Event)
+        .where(Event.id == event_id)
+        .values(seats_taken=Event.seats_taken - 1)
+        .execution_options(synchronize_session=False)
+    )
+    analytics.record(event_id, cancellations=1, revenue=-(refund[0] or 0.0))
+    promoted = promote(event_id)
+    db.session.commit()
+    notify_promoted(promoted)
+    return promoted